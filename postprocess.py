@@ -69,6 +69,7 @@ from joblib import Parallel, delayed
 
 import numpy as np
 import cv2
+from scipy import ndimage
 
 import zipfile
 import py7zr
@@ -274,49 +275,113 @@ def mask_postprocess(mask_name, source, output, width, height, should_resize=Fal
     
     mask_rgb_img = cv2.imread(source_path, cv2.IMREAD_UNCHANGED)
     if mask_rgb_img is not None:
-        grey_mask = rgb_mask_to_grey_mask(mask_rgb_img)
+        grey_mask, colors = rgb_mask_to_grey_mask(mask_rgb_img, return_colors=True)
         if should_resize:
             grey_mask = resize(grey_mask, width, height, is_mask=True)
         cv2.imwrite(output_path, grey_mask)
+        return compute_instance_statistics(grey_mask, colors)
+    return None
         
-def rgb_mask_to_grey_mask(rgb_img, verify=False):
+def rgb_mask_to_grey_mask(rgb_img, verify=False, return_colors=False):
     """
     Tries to transform a RGB Mask to a Grey Mask. Every unique RGB Value should be a new increasing number = 1, 2, 3, 4, 5, 6
 
     And 0, 0, 0 should be 0
+
+    return_colors -> also returns the original color of every grey value (index = grey value)
     """
+    # the alpha channel is not part of the label (BGRA background is 0, 0, 0, 255)
+    rgb_img = rgb_img[:, :, :3]
     height, width, channels = rgb_img.shape
 
-    # init new mask with only 0 -> everything is background
-    grey_mask = np.zeros((height, width), dtype=np.uint8)
-
    # Get unique RGB values for every row (axis = 0) and before tranform in a simple 2D rgb array
-    unique_rgb_values = np.unique(rgb_img.reshape(-1, rgb_img.shape[2]), axis=0)
+   # inverse -> index of the unique value for every pixel
+    unique_rgb_values, inverse = np.unique(rgb_img.reshape(-1, rgb_img.shape[2]), axis=0, return_inverse=True)
     
-    # Create a mapping from RGB values to increasing integers
-    rgb_to_grey = {}
-    counter = 1  # Start with 1 since 0 will be reserved for black
-    for cur_rgb_value in unique_rgb_values:
-        if not np.array_equal(cur_rgb_value, [0, 0, 0]):  # Exclude black
-            rgb_to_grey[tuple(cur_rgb_value)] = counter
-            counter += 1
-        else:
-            rgb_to_grey[tuple([0, 0, 0])] = 0
+    # black is the smallest value -> if it exists it is the first one and gets 0, the others 1, 2, 3, ...
+    has_background = np.array_equal(unique_rgb_values[0], [0, 0, 0])
+    if not has_background:
+        inverse = inverse + 1
+        unique_rgb_values = np.concatenate([np.zeros((1, channels), dtype=rgb_img.dtype), unique_rgb_values], axis=0)
 
-    # Fill the grey mask using the mapping
-    for y in range(height):
-        for x in range(width):
-            rgb_tuple = tuple(rgb_img[y, x])
-            grey_mask[y, x] = rgb_to_grey[rgb_tuple] # rgb_to_grey.get(rgb_tuple, 0)  # Default to 0 for black
+    grey_mask = inverse.reshape(height, width).astype(np.uint8)
 
+    if return_colors:
+        return grey_mask, unique_rgb_values
     return grey_mask
 
+def compute_instance_statistics(grey_mask, colors):
+    """
+    Statistics of every instance (grey value > 0) in a grey mask:
+    - labels: grey value
+    - areas: amount of pixels
+    - bboxes: x_min, y_min, x_max, y_max (inclusive)
+    - colors: original RGB color
+    """
+    areas = np.bincount(grey_mask.ravel(), minlength=len(colors))
+    labels = np.nonzero(areas[1:])[0] + 1
+
+    bboxes = np.zeros((len(labels), 4), dtype=np.int32)
+    slices = ndimage.find_objects(grey_mask)
+    for idx, cur_label in enumerate(labels):
+        cur_y, cur_x = slices[cur_label-1]
+        bboxes[idx] = [cur_x.start, cur_y.start, cur_x.stop-1, cur_y.stop-1]
+
+    # OpenCV loads BGR(A)
+    rgb_colors = np.asarray(colors)[labels, :3][:, ::-1] if len(labels) > 0 else np.zeros((0, 3))
+
+    return {
+        "labels": labels.astype(np.uint8),
+        "areas": areas[labels].astype(np.int64),
+        "bboxes": bboxes,
+        "colors": rgb_colors.astype(np.uint16)
+    }
+
+def save_instance_statistics(image_names, statistics, output_path):
+    """
+    Saves the instance statistics of all images as columnar NPZ file.
+
+    The instances of image i are at instance_offsets[i]:instance_offsets[i+1] in labels, areas, bboxes and colors.
+    """
+    instance_counts = np.array([len(cur_stats["labels"]) for cur_stats in statistics], dtype=np.int64)
+    instance_offsets = np.concatenate([[0], np.cumsum(instance_counts)]).astype(np.int64)
+
+    def stack(key, shape):
+        if len(statistics) == 0:
+            return np.zeros(shape)
+        return np.concatenate([cur_stats[key] for cur_stats in statistics], axis=0)
+
+    np.savez(output_path,
+             image_names=np.array(image_names),
+             instance_counts=instance_counts,
+             instance_offsets=instance_offsets,
+             labels=stack("labels", (0,)),
+             areas=stack("areas", (0,)),
+             bboxes=stack("bboxes", (0, 4)),
+             colors=stack("colors", (0, 3)))
+
+def load_instance_statistics(statistics_path):
+    with np.load(statistics_path) as statistics:
+        return {key: statistics[key] for key in statistics.files}
+
+def filter_images_by_instances(statistics, min_instances=1, min_area=0):
+    """
+    Returns the image names with at least min_instances instances which have at least min_area pixels.
+    """
+    if min_area > 0:
+        big_enough = (statistics["areas"] >= min_area).astype(np.int64)
+        cumulative = np.concatenate([[0], np.cumsum(big_enough)])
+        counts = cumulative[statistics["instance_offsets"][1:]] - cumulative[statistics["instance_offsets"][:-1]]
+    else:
+        counts = statistics["instance_counts"]
+    return statistics["image_names"][counts >= min_instances]
+
 def rgb_depth_mask_postprocess(name, source, width, height, only_mask_convertion):
     
     if only_mask_convertion == False:
         rgb_postprocess(name, os.path.join(source, "rgb"), os.path.join(source, "rgb-prep"), width, height)
         depth_postprocess(name, os.path.join(source, "depth"), os.path.join(source, "depth-prep"), width, height)
-    mask_postprocess(name, os.path.join(source, "mask"), os.path.join(source, "mask-prep"), width, height, should_resize=(not only_mask_convertion))
+    return mask_postprocess(name, os.path.join(source, "mask"), os.path.join(source, "mask-prep"), width, height, should_resize=(not only_mask_convertion))
 
 
 def postprocess(source_path, dataset, width, height, only_mask_convertion=True, delete_original=False, n_jobs=-1):
@@ -328,6 +393,9 @@ def postprocess(source_path, dataset, width, height, only_mask_convertion=True,
     Depth-Images get resized and transformed to grey images.
     
     Mask-Images get resized and transformed to grey images.
+
+    The instance statistics of the masks (counts, areas, bounding boxes, colors) get saved in
+    instance_statistics.npz (see load_instance_statistics and filter_images_by_instances).
     """
     start_str = f"Start 3xM postprocessing! ({get_time_str()})"
     print(start_str)
@@ -364,13 +432,18 @@ def postprocess(source_path, dataset, width, height, only_mask_convertion=True,
         print_progress(idx, total_images)
         print(f"\n\n      -> Needed: {calc_duration(start_time)}")
         if cur_name is not None:
-            rgb_depth_mask_postprocess(cur_name, source_path, width, height, only_mask_convertion)
+            return rgb_depth_mask_postprocess(cur_name, source_path, width, height, only_mask_convertion)
         
     # run all tasks as fast as possible
-    Parallel(n_jobs=n_jobs)(
+    statistics = Parallel(n_jobs=n_jobs)(
         delayed(process_with_progress)(cur_name, idx)
         for idx, cur_name in enumerate(all_images)
     )
+
+    # by-product of the mask convertion -> no re-decoding for filtering
+    loaded = [(cur_name, cur_stats) for cur_name, cur_stats in zip(all_images, statistics) if cur_stats is not None]
+    save_instance_statistics([cur_name for cur_name, _ in loaded], [cur_stats for _, cur_stats in loaded],
+                             os.path.join(source_path, "instance_statistics.npz"))
     
     if delete_original:
         if only_mask_convertion == False:
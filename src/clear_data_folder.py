@@ -1,6 +1,12 @@
 import os
+import sys
+import time
+import shutil
+import fnmatch
+import tempfile
+import subprocess
 
-print(f"{'-'*12}\nStarted clearing Screenshot Folder...")
+from joblib import Parallel, delayed
 
 # PROJECT_NAME = "dataset_gen_3xM"
 
@@ -16,32 +22,131 @@ ABSOLUTE_PROJECT_PATH = "D:/Informatik/Projekte/3xM/3xM/"
 #         PROJECT_PATH = f"../{PROJECT_NAME}"
 #     else:
 #         raise FileNotFoundError(f"Can't find Unreal project '{PROJECT_NAME}'.\n   -> Make sure that you have this file in your project or one dir over your Unreal Project!")
-# 
+#
 # # find Screenshot Path
 # IMAGE_SAVE_PATH = os.path.join(PROJECT_PATH, "Saved", "Screenshots")
 
 # print(f"Founded Screenshot-folder at: {IMAGE_SAVE_PATH}")
 
-# delete all files in Screenshot folder, but not the folders
-print("\nStart deleting...")
-success = 0
-fail = 0
-for cur_dir_path, cur_dirs, cur_files in os.walk(ABSOLUTE_PROJECT_PATH):
-    for cur_file in cur_files:
-        file_path = os.path.join(cur_dir_path, cur_file)
+
+def find_files(path, patterns=None):
+    """
+    Returns all files in path and its subfolders.
+
+    patterns -> glob filters like ["*.png", "Camera_*"], a file gets returned if its name matches one of them
+    """
+    file_paths = []
+    stack = [path]
+    while len(stack) > 0:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack += [entry.path]
+                elif patterns is None or any([fnmatch.fnmatch(entry.name, cur_pattern) for cur_pattern in patterns]):
+                    file_paths += [entry.path]
+    return file_paths
+
+
+def delete_file_chunk(file_paths):
+    success = 0
+    errors = []
+    for file_path in file_paths:
         try:
             os.remove(file_path)
             success += 1
-            print(f"{file_path} has been deleted.")
-        except FileNotFoundError:
-            print(f"The file {file_path} does not exist.")
-            fail += 1
-        except PermissionError:
-            print(f"Permission denied: unable to delete {file_path}.")
-            fail += 1
         except Exception as e:
-            print(f"Error: {e}")
-            fail += 1
+            errors += [f"{file_path}: {e}"]
+    return success, errors
+
+
+def delete_files(file_paths, n_threads=16, chunk_size=1024):
+    """
+    Deletes the files in a thread pool. Returns the amount of deleted files and the errors.
+    """
+    chunks = [file_paths[idx:idx+chunk_size] for idx in range(0, len(file_paths), chunk_size)]
+    results = Parallel(n_jobs=n_threads, prefer="threads")(
+        delayed(delete_file_chunk)(cur_chunk) for cur_chunk in chunks
+    )
+
+    success = sum([cur_success for cur_success, _ in results])
+    errors = [cur_error for _, cur_errors in results for cur_error in cur_errors]
+    return success, errors
+
+
+def move_aside_and_remove(path, background=True):
+    """
+    Renames the folder and creates a new empty one, so the next render can start immediately.
+    The renamed folder gets removed in a background process (or directly if background is False).
+
+    The subfolders get removed too.
+
+    The trash folder is unique (tempfile.mkdtemp next to the folder), so two clears in the same second do not collide.
+
+    Returns the trash folder and the amount of moved entries (files and folders directly in path).
+    """
+    path = os.path.normpath(path)
+    n_entries = len(os.listdir(path))
+    trash_path = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + "_trash_")
+    os.rename(path, os.path.join(trash_path, os.path.basename(path)))
+    os.makedirs(path, exist_ok=True)
+
+    if background:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--remove", trash_path],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    else:
+        shutil.rmtree(trash_path, ignore_errors=True)
+    return trash_path, n_entries
+
+
+def clear_folder(path, patterns=None, dry_run=False, move_aside=False, n_threads=16):
+    """
+    Deletes all files in a folder and its subfolders, but not the folders.
+
+    patterns -> glob filters for the file names (see find_files)
+    dry_run -> only counts the files
+    move_aside -> renames the folder and removes it in the background (see move_aside_and_remove),
+                  only without patterns, the subfolders get removed too
+
+    Returns the amount of deleted files (with move_aside the amount of moved files and folders directly in path).
+    """
+    print(f"{'-'*12}\nStarted clearing {path}...")
+    start_time = time.time()
+
+    if move_aside and patterns is None and not dry_run:
+        trash_path, n_entries = move_aside_and_remove(path, background=True)
+        print(f"Moved {n_entries} entries to {trash_path}, removing in the background ({time.time()-start_time:.2f}s).")
+        return n_entries
+
+    file_paths = find_files(path, patterns=patterns)
+    search_duration = time.time() - start_time
+
+    if dry_run:
+        print(f"Founded {len(file_paths)} Files in {search_duration:.1f}s (dry run, nothing deleted).")
+        return len(file_paths)
+
+    success, errors = delete_files(file_paths, n_threads=n_threads)
+    duration = time.time() - start_time
+
+    for cur_error in errors[:10]:
+        print(f"Error: {cur_error}")
+    if len(errors) > 10:
+        print(f"... and {len(errors)-10} more errors")
+
+    print(f"{'-'*12}\nFounded {len(file_paths)} Files.\n    -> Successfull Cleared: {success}\n    -> Failed Cleared: {len(errors)}")
+    print(f"    -> Needed {duration:.1f}s ({success/max(duration, 1e-6):.0f} files/s, search {search_duration:.1f}s)")
+    return success
+
+
+if __name__ == "__main__" and "--remove" in sys.argv:
+    # background removal of a moved folder
+    shutil.rmtree(sys.argv[sys.argv.index("--remove")+1], ignore_errors=True)
+elif __name__ == "__main__":
+    # delete all files in Screenshot folder, but not the folders
+    clear_folder(ABSOLUTE_PROJECT_PATH, patterns=None, dry_run=False, move_aside=False, n_threads=16)
+
+    # only count the screenshots
+    # clear_folder(ABSOLUTE_PROJECT_PATH, patterns=["*.png", "*.exr"], dry_run=True)
 
-print(f"{'-'*12}\nFounded {success+fail} Files.\n    -> Successfull Cleared: {success}\n    -> Failed Cleared: {fail}") 
+    # start the next render directly, the old screenshots get removed in the background
+    # clear_folder(ABSOLUTE_PROJECT_PATH, move_aside=True)
 
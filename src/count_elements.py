@@ -1,7 +1,141 @@
 import os
+import json
+import time
 
+from joblib import Parallel, delayed
 
-def count(path, have_subdirs=False):
+
+def get_file_stats(dir_path):
+    # size and modification time of every file in one directory (without subdirs) -> {name: [size, mtime]}
+    file_stats = dict()
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                cur_stat = entry.stat()
+                file_stats[entry.name] = [cur_stat.st_size, cur_stat.st_mtime]
+    return file_stats
+
+
+def scan_dir(dir_path):
+    """
+    Lists one directory (without subdirs) -> {"mtime", "n_files", "bytes", "extensions", "subdirs", "files"}
+    """
+    record = {"mtime": os.stat(dir_path).st_mtime, "n_files": 0, "bytes": 0, "extensions": dict(), "subdirs": [], "files": dict()}
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                record["subdirs"] += [entry.name]
+            elif entry.is_file():
+                cur_stat = entry.stat()
+                file_type = entry.name.split(".")[-1]
+                record["extensions"][file_type] = record["extensions"].get(file_type, 0) + 1
+                record["n_files"] += 1
+                record["bytes"] += cur_stat.st_size
+                record["files"][entry.name] = [cur_stat.st_size, cur_stat.st_mtime]
+    return record
+
+
+def is_record_valid(record, dir_path, check_files=True):
+    # the modification time of a directory only changes if files get added, removed or renamed
+    # -> files which got overwritten in place are only found with the sizes and modification times of the files
+    if record["mtime"] != os.stat(dir_path).st_mtime:
+        return False
+    return not check_files or record.get("files") == get_file_stats(dir_path)
+
+
+def scan_element(element_path, cached_dirs=None, check_files=True):
+    """
+    Scans all directories of one element.
+
+    cached_dirs -> directory records of a previous scan, unchanged directories get reused
+    check_files -> also compares the size and modification time of every file (finds files which got overwritten in place),
+                   False only compares the modification time of the directories (faster, but overwritten files
+                   keep their old size until the snapshot gets deleted)
+
+    Returns the directory records {relative path: record} and the amount of rescanned directories.
+    """
+    dirs = dict()
+    rescanned = 0
+    stack = ["."]
+    while len(stack) > 0:
+        cur_rel_path = stack.pop()
+        cur_path = os.path.normpath(os.path.join(element_path, cur_rel_path))
+
+        cached = cached_dirs.get(cur_rel_path) if cached_dirs else None
+        if cached is not None and is_record_valid(cached, cur_path, check_files):
+            record = cached
+        else:
+            record = scan_dir(cur_path)
+            rescanned += 1
+
+        dirs[cur_rel_path] = record
+        stack += [os.path.join(cur_rel_path, cur_subdir).replace("\\", "/") for cur_subdir in record["subdirs"]]
+    return dirs, rescanned
+
+
+def scan_elements(path, have_subdirs=False, n_threads=16, snapshot_path=None, check_files=True):
+    """
+    Fast statistics of all elements in a dir (one element = one folder, like count).
+
+    The elements get scanned in a thread pool (good for network storage).
+
+    snapshot_path -> JSON with the directory records of the last scan,
+                     only changed directories get rescanned and the snapshot gets updated
+    check_files -> see scan_element
+
+    Returns:
+    {"path", "n_elements", "n_files", "bytes", "extensions": {type: count},
+     "elements": {element: {"n_files", "bytes"}}, "rescanned_dirs", "duration"}
+    """
+    start_time = time.time()
+
+    if have_subdirs:
+        element_names = [f"{category}/{cur_elem_dir}"
+                         for category in sorted(os.listdir(path)) if os.path.isdir(os.path.join(path, category))
+                         for cur_elem_dir in sorted(os.listdir(os.path.join(path, category)))]
+    else:
+        element_names = sorted(os.listdir(path))
+    element_names = [cur_name for cur_name in element_names if os.path.isdir(os.path.join(path, cur_name))]
+
+    snapshot = dict()
+    if snapshot_path is not None and os.path.exists(snapshot_path):
+        with open(snapshot_path, "r") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+
+    scans = Parallel(n_jobs=n_threads, prefer="threads")(
+        delayed(scan_element)(os.path.join(path, cur_name), snapshot.get(cur_name), check_files)
+        for cur_name in element_names
+    )
+
+    result = {"path": path, "n_elements": len(element_names), "n_files": 0, "bytes": 0,
+              "extensions": dict(), "elements": dict(), "rescanned_dirs": 0}
+    new_snapshot = dict()
+    for cur_name, (cur_dirs, cur_rescanned) in zip(element_names, scans):
+        new_snapshot[cur_name] = cur_dirs
+        result["rescanned_dirs"] += cur_rescanned
+
+        cur_files = 0
+        cur_bytes = 0
+        for cur_record in cur_dirs.values():
+            cur_files += cur_record["n_files"]
+            cur_bytes += cur_record["bytes"]
+            for file_type, amount in cur_record["extensions"].items():
+                result["extensions"][file_type] = result["extensions"].get(file_type, 0) + amount
+        result["elements"][cur_name] = {"n_files": cur_files, "bytes": cur_bytes}
+        result["n_files"] += cur_files
+        result["bytes"] += cur_bytes
+
+    if snapshot_path is not None:
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, "w") as snapshot_file:
+            json.dump(new_snapshot, snapshot_file)
+        os.replace(tmp_path, snapshot_path)
+
+    result["duration"] = time.time() - start_time
+    return result
+
+
+def count(path, have_subdirs=False, n_threads=16, snapshot_path=None, check_files=True):
     """
     Counts all elements and filetypes in a dir with subdirs or without.
 
@@ -10,49 +144,33 @@ def count(path, have_subdirs=False):
 
     have_subdirs = False:
     /home/user/dir -> searches for folders and files direct in this path
+
+    Returns the statistics of scan_elements.
     """
-    n_elements = 0
-    content = dict()
+    result = scan_elements(path, have_subdirs=have_subdirs, n_threads=n_threads, snapshot_path=snapshot_path, check_files=check_files)
 
-    if have_subdirs:
-        for category in os.listdir(path):
-            for cur_elem_dir in os.listdir(os.path.join(path, category)):
-                if os.path.isdir(os.path.join(path, category, cur_elem_dir)):
-                    n_elements += 1
-
-                    for cur_path, cur_dirs, cur_files in os.walk(os.path.join(path, category, cur_elem_dir)):
-                        for cur_file in cur_files:
-                            file_type = cur_file.split(".")[-1]
-                            if file_type in content.keys():
-                                content[file_type] += 1
-                            else:
-                                content[file_type] = 1
-    else:
-        for cur_elem_dir in os.listdir(path):
-            if os.path.isdir(os.path.join(path, cur_elem_dir)):
-                n_elements += 1
-
-                for cur_path, cur_dirs, cur_files in os.walk(os.path.join(path, cur_elem_dir)):
-                    for cur_file in cur_files:
-                        file_type = cur_file.split(".")[-1]
-                        if file_type in content.keys():
-                            content[file_type] += 1
-                        else:
-                            content[file_type] = 1
-
-    print(f"Founded {n_elements} elements.")
+    print(f"Founded {result['n_elements']} elements.")
     print(f"File-Types:")
-    for key, value in sorted(content.items(), key=lambda x:x[1]):
+    for key, value in sorted(result["extensions"].items(), key=lambda x:x[1]):
         print(f"    -> '{key}': {value}")
+    print(f"Size: {result['bytes']/1024**3:.2f} GB (scanned {result['rescanned_dirs']} dirs in {result['duration']:.1f}s)")
+
+    return result
 
 
 if __name__ == "__main__":
     PATH = "/home/tobia/data/3xM/3xM/"
 
     print(f"\n {'-'*16}\n    3D-MODELS\n {'-'*16}")
-    count(path=os.path.join(PATH, "models"), have_subdirs=False)
+    models = count(path=os.path.join(PATH, "models"), have_subdirs=False)
 
     print(f"\n\n {'-'*16}\n    MATERIALS\n {'-'*16}")
-    count(path=os.path.join(PATH, "materials"), have_subdirs=False)
+    materials = count(path=os.path.join(PATH, "materials"), have_subdirs=False)
+
+    # with snapshot -> the next audit only rescans changed dirs
+    # materials = count(path=os.path.join(PATH, "materials"), snapshot_path=os.path.join(PATH, "materials_snapshot.json"))
+
+    # with open(os.path.join(PATH, "element_statistics.json"), "w") as statistics_file:
+    #     json.dump({"models": models, "materials": materials}, statistics_file, indent=4)
+
 
-    
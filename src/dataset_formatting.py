@@ -0,0 +1,247 @@
+"""
+Formatting of datasets into the prepared layout:
+
+output_path
+........rgb/image_00000000.png
+........masks/image_00000000.png
+........depth/image_00000000.png
+
+Every source format is a source adapter, which lazily yields the samples of a dataset as
+{"rgb": path, "mask": path, "depth": path or None, "mask_type": "grey" or "rgb", "depth_channel": None or channel index}
+
+Source formats:
+- ocid -> OCID (Object Clutter Indoor Dataset), folders with rgb, depth and label subfolders
+- single_scene_dir -> 3xM scene folders with raw*.png and mask*.png (SINGLE_SCENE_DIR)
+- dual_dir -> extracted 3xM dataset with rgb, depth and mask folders (DUAL_DIR)
+"""
+
+import os
+import time
+import shutil
+
+import numpy as np
+import cv2
+
+from joblib import Parallel, delayed
+
+OUTPUT_DIRS = {
+    "rgb": "rgb",
+    "mask": "masks",
+    "depth": "depth"
+}
+
+IMAGE_ENDINGS = (".png", ".jpg")
+
+
+
+def rgb_mask_to_grey_mask(rgb_img):
+    """
+    Every unique RGB value gets a new increasing number = 1, 2, 3, ... and 0, 0, 0 gets 0
+
+    The alpha channel of BGRA masks is ignored (the background is 0, 0, 0, 255).
+    """
+    if rgb_img.ndim == 2:
+        return rgb_img.astype(np.uint8)
+    rgb_img = rgb_img[:, :, :3]
+    height, width, channels = rgb_img.shape
+
+    unique_rgb_values, inverse = np.unique(rgb_img.reshape(-1, channels), axis=0, return_inverse=True)
+    if not np.array_equal(unique_rgb_values[0], [0, 0, 0]):
+        inverse = inverse + 1
+    return inverse.reshape(height, width).astype(np.uint8)
+
+def has_an_object(mask_img):
+    return mask_img.min() != mask_img.max()
+
+
+
+# Source adapters
+def iter_ocid_samples(source_path):
+    for cur_root, cur_dirs, cur_files in os.walk(source_path):
+        # same order on every machine
+        cur_dirs.sort()
+        if "rgb" in cur_dirs and "label" in cur_dirs:
+            for cur_image_name in sorted(os.listdir(os.path.join(cur_root, "rgb"))):
+                mask = os.path.join(cur_root, "label", cur_image_name)
+                depth = os.path.join(cur_root, "depth", cur_image_name)
+                if os.path.exists(mask):
+                    yield {
+                        "rgb": os.path.join(cur_root, "rgb", cur_image_name),
+                        "mask": mask,
+                        "depth": depth if os.path.exists(depth) else None,
+                        "mask_type": "grey",
+                        "depth_channel": None
+                    }
+
+def iter_single_scene_dir_samples(source_path, with_subfolders=True):
+    if with_subfolders:
+        scene_dirs = (os.path.join(source_path, cur_dir, cur_scene)
+                      for cur_dir in sorted(os.listdir(source_path))
+                      for cur_scene in sorted(os.listdir(os.path.join(source_path, cur_dir))))
+    else:
+        scene_dirs = (os.path.join(source_path, cur_scene) for cur_scene in sorted(os.listdir(source_path)))
+
+    for cur_scene_dir in scene_dirs:
+        if not os.path.isdir(cur_scene_dir):
+            continue
+        files = {"raw": None, "mask": None, "depth": None}
+        for cur_file in sorted(os.listdir(cur_scene_dir)):
+            for cur_prefix in files.keys():
+                if cur_file.startswith(cur_prefix) and files[cur_prefix] is None:
+                    files[cur_prefix] = os.path.join(cur_scene_dir, cur_file)
+
+        if files["raw"] is not None and files["mask"] is not None:
+            yield {
+                "rgb": files["raw"],
+                "mask": files["mask"],
+                "depth": files["depth"],
+                "mask_type": "rgb",
+                "depth_channel": 1
+            }
+
+def iter_dual_dir_samples(source_path, rgb_dir="rgb", mask_dir="mask", depth_dir="depth"):
+    for cur_name in sorted(os.listdir(os.path.join(source_path, mask_dir))):
+        if not cur_name.endswith(IMAGE_ENDINGS):
+            continue
+        rgb = os.path.join(source_path, rgb_dir, cur_name)
+        depth = os.path.join(source_path, depth_dir, cur_name)
+        if os.path.exists(rgb):
+            yield {
+                "rgb": rgb,
+                "mask": os.path.join(source_path, mask_dir, cur_name),
+                "depth": depth if os.path.exists(depth) else None,
+                "mask_type": "rgb",
+                # depth is encoded in the G channel
+                "depth_channel": 1
+            }
+
+SOURCE_ADAPTERS = {
+    "ocid": iter_ocid_samples,
+    "single_scene_dir": iter_single_scene_dir_samples,
+    "dual_dir": iter_dual_dir_samples
+}
+
+
+
+# Conversion
+def get_output_name(idx):
+    return f"image_{idx:08}.png"
+
+def convert_depth(depth_path, output_path, depth_channel=None, depth_range=None):
+    """
+    depth_range -> (min, max) for the same normalization for all images, None normalizes every image with its min and max
+    """
+    depth_img = cv2.imread(depth_path, cv2.IMREAD_UNCHANGED)
+    if depth_img is None:
+        return False
+    if depth_channel is not None and depth_img.ndim == 3:
+        depth_img = depth_img[:, :, depth_channel]
+
+    if depth_range is None:
+        depth_img = cv2.normalize(depth_img, None, 0, 255, cv2.NORM_MINMAX)
+    else:
+        depth_min, depth_max = depth_range
+        depth_img = (np.clip(depth_img, depth_min, depth_max) - depth_min) * (255.0 / (depth_max - depth_min))
+    cv2.imwrite(output_path, depth_img.astype(np.uint8))
+    return True
+
+def convert_sample(sample, idx, output_paths, keep_empty=False, depth_range=None):
+    """
+    Decodes every file once and writes the sample as image_{idx:08}.png.
+
+    Returns True if the sample got written.
+    """
+    mask_img = cv2.imread(sample["mask"], cv2.IMREAD_UNCHANGED)
+    if mask_img is None:
+        print(f"Could not load mask: {sample['mask']}")
+        return False
+
+    if sample["mask_type"] == "rgb":
+        mask_img = rgb_mask_to_grey_mask(mask_img)
+    else:
+        mask_img = mask_img.astype(np.uint8)
+
+    if not keep_empty and not has_an_object(mask_img):
+        print(f"Mask has no objects: {sample['mask']}")
+        return False
+
+    output_name = get_output_name(idx)
+    cv2.imwrite(os.path.join(output_paths["mask"], output_name), mask_img)
+
+    # rgb only needs decoding if it is not already a png
+    if sample["rgb"].lower().endswith(".png"):
+        shutil.copy(sample["rgb"], os.path.join(output_paths["rgb"], output_name))
+    else:
+        cv2.imwrite(os.path.join(output_paths["rgb"], output_name), cv2.imread(sample["rgb"]))
+
+    if sample["depth"] is not None:
+        convert_depth(sample["depth"], os.path.join(output_paths["depth"], output_name),
+                      depth_channel=sample["depth_channel"], depth_range=depth_range)
+    return True
+
+def renumber_outputs(written, output_paths):
+    """
+    Closes the gaps of skipped samples -> image_00000000, image_00000001, ... in the order of the samples.
+
+    The new index is never bigger than the old one, so renaming in increasing order can not overwrite a file.
+    """
+    new_idx = 0
+    for idx, was_written in enumerate(written):
+        if not was_written:
+            continue
+        if new_idx != idx:
+            for cur_path in output_paths.values():
+                cur_source = os.path.join(cur_path, get_output_name(idx))
+                if os.path.exists(cur_source):
+                    os.rename(cur_source, os.path.join(cur_path, get_output_name(new_idx)))
+        new_idx += 1
+    return new_idx
+
+def format_dataset(source_path, output_path, source_format="ocid", n_jobs=-1, keep_empty=False,
+                   depth_range=None, output_dirs=None, **adapter_kwargs):
+    """
+    Formats a dataset into the prepared layout (see top of the file).
+
+    source_format -> key of SOURCE_ADAPTERS
+    keep_empty -> also keeps samples without an object in the mask
+    depth_range -> see convert_depth
+    output_dirs -> names of the output folders, default is OUTPUT_DIRS
+    adapter_kwargs -> for example with_subfolders for single_scene_dir
+
+    The samples are converted in a process pool, the numbering follows the (sorted) order of the source.
+    """
+    start_time = time.time()
+
+    if output_dirs is None:
+        output_dirs = OUTPUT_DIRS
+
+    # clear and create output path
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)
+
+    output_paths = dict()
+    for cur_key, cur_dir in output_dirs.items():
+        output_paths[cur_key] = os.path.join(output_path, cur_dir)
+        os.makedirs(output_paths[cur_key], exist_ok=True)
+
+    samples = SOURCE_ADAPTERS[source_format](source_path, **adapter_kwargs)
+
+    written = Parallel(n_jobs=n_jobs)(
+        delayed(convert_sample)(cur_sample, idx, output_paths, keep_empty, depth_range)
+        for idx, cur_sample in enumerate(samples)
+    )
+
+    amount = renumber_outputs(written, output_paths)
+    print(f"Formatted {amount}/{len(written)} samples from {source_path} in {time.time()-start_time:.1f}s.")
+    return amount
+
+
+
+if __name__ == "__main__":
+    format_dataset(source_path="/home/tobia/data/3xM/3xM-Test/OCID-dataset",
+                   output_path="/home/tobia/data/3xM/3xM-Test/OCID-dataset-prep",
+                   source_format="ocid")
+
+    # format_dataset(source_path="D:/3xM/3xM_Dataset_160_160", output_path="D:/3xM/3xM_Dataset_160_160_prep",
+    #                source_format="dual_dir")
+
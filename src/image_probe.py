@@ -0,0 +1,138 @@
+"""
+Fast image validation by reading only the PNG/JPEG header instead of decoding the whole image.
+"""
+
+import os
+import struct
+
+import cv2
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_IEND = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+# PNG color type -> channels (palette images get decoded as 3 channels)
+PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+# JPEG start of frame markers (baseline, progressive, lossless, ...)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def probe_png(image_file):
+    header = image_file.read(8 + 8 + 13)
+    if len(header) < 29 or header[:8] != PNG_SIGNATURE or header[12:16] != b"IHDR":
+        return None
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", header[16:26])
+    return {
+        "format": "png",
+        "width": width,
+        "height": height,
+        "channels": PNG_CHANNELS.get(color_type),
+        "bit_depth": bit_depth
+    }
+
+def probe_jpeg(image_file):
+    if image_file.read(2) != b"\xff\xd8":
+        return None
+
+    while True:
+        byte = image_file.read(1)
+        if len(byte) == 0:
+            return None
+        if byte != b"\xff":
+            continue
+
+        # skip fill bytes
+        marker = image_file.read(1)
+        while marker == b"\xff":
+            marker = image_file.read(1)
+        if len(marker) == 0:
+            return None
+        marker = marker[0]
+
+        # markers without length
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            continue
+        # start of scan without frame header -> broken
+        if marker in [0xD9, 0xDA]:
+            return None
+
+        length_bytes = image_file.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+
+        if marker in JPEG_SOF_MARKERS:
+            frame = image_file.read(6)
+            if len(frame) < 6:
+                return None
+            bit_depth, height, width, channels = struct.unpack(">BHHB", frame)
+            return {
+                "format": "jpeg",
+                "width": width,
+                "height": height,
+                "channels": channels,
+                "bit_depth": bit_depth
+            }
+
+        image_file.seek(length - 2, os.SEEK_CUR)
+
+def is_truncated(image_file, image_format):
+    """
+    Cheap check of the end of the file (PNG: IEND chunk, JPEG: EOI marker).
+    """
+    image_file.seek(0, os.SEEK_END)
+    size = image_file.tell()
+    image_file.seek(max(0, size - 64))
+    tail = image_file.read()
+
+    if image_format == "png":
+        return not tail.endswith(PNG_IEND)
+    elif image_format == "jpeg":
+        # some writers add padding after the end marker
+        return not tail.rstrip(b"\x00").endswith(b"\xff\xd9")
+    return False
+
+def probe_with_decode(image_path):
+    img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if img is None or img.size == 0:
+        return None
+    return {
+        "format": image_path.split(".")[-1].lower(),
+        "width": img.shape[1],
+        "height": img.shape[0],
+        "channels": 1 if img.ndim == 2 else img.shape[2],
+        "bit_depth": img.dtype.itemsize * 8
+    }
+
+def probe_image(image_path, check_truncated=False, decode_fallback=True):
+    """
+    Returns the image information without decoding the image:
+    {"format", "width", "height", "channels", "bit_depth"}
+
+    Returns None if the image is not readable (or truncated, if check_truncated is True).
+
+    Formats other than PNG and JPEG get decoded with OpenCV, if decode_fallback is True.
+    """
+    try:
+        with open(image_path, "rb") as image_file:
+            start = image_file.read(8)
+            image_file.seek(0)
+
+            if start.startswith(PNG_SIGNATURE):
+                info = probe_png(image_file)
+            elif start.startswith(b"\xff\xd8"):
+                info = probe_jpeg(image_file)
+            elif decode_fallback:
+                return probe_with_decode(image_path)
+            else:
+                return None
+
+            if info is not None and check_truncated and is_truncated(image_file, info["format"]):
+                return None
+    except OSError:
+        return None
+
+    return info
+
+def is_image_valid(image_path, check_truncated=True):
+    return probe_image(image_path, check_truncated=check_truncated) is not None
+
@@ -1,3 +1,7 @@
+import os
+import json
+import time
+import hashlib
 import unreal
 
 def import_fbx_as_static_mesh(fbx_file_path, destination_path):
@@ -19,14 +23,152 @@ def import_fbx_as_static_mesh(fbx_file_path, destination_path):
     return asset_import_task.imported_object_paths
 
 
-fbx_dir = "D:/Informatik/Projekte/3xM/model_material/final_models"
-destination = "D:/Informatik/Unreal Engine/dataset_gen_3xM/Content/3xM/3D_models"
 
-for cur_fbx_file in os.listdir(fbx_dir):
-    cur_path = os.path.join(fbx_dir, cur_fbx_file)
-    if os.path.isfile(cur_path) and cur_path.endswith(".fbx"):
-        cur_dest = os.path.join(destination, cur_fbx_file)
-        imported_assets = import_fbx_as_static_mesh(cur_path, cur_dest)
-        print("Imported assets:", imported_assets)
+def create_static_mesh_import_options():
+    # one options object for all tasks
+    fbx_import_options = unreal.FbxImportUI()
+    fbx_import_options.import_mesh = True
+    fbx_import_options.import_materials = False
+    fbx_import_options.import_textures = False
+    fbx_import_options.import_animations = False
+    fbx_import_options.mesh_type_to_import = unreal.FBXImportType.FBXIT_STATIC_MESH
+    return fbx_import_options
+
+
+
+def create_static_mesh_import_task(fbx_file_path, destination_path, fbx_import_options):
+    asset_import_task = unreal.AssetImportTask()
+    asset_import_task.filename = fbx_file_path
+    asset_import_task.destination_path = destination_path
+    asset_import_task.options = fbx_import_options
+    asset_import_task.replace_existing = True
+    asset_import_task.automated = True
+    asset_import_task.save = False
+    return asset_import_task
+
+
+
+def get_file_hash(file_path, chunk_size=1024*1024):
+    file_hash = hashlib.md5()
+    with open(file_path, "rb") as cur_file:
+        for chunk in iter(lambda: cur_file.read(chunk_size), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+
+def load_import_manifest(manifest_path):
+    # fbx file name -> {"hash": ..., "asset_paths": [...]}
+    if not os.path.exists(manifest_path):
+        return dict()
+    with open(manifest_path, "r") as manifest_file:
+        return json.load(manifest_file)
+
+
+
+def save_import_manifest(manifest, manifest_path):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+    os.replace(tmp_path, manifest_path)
+
+
+
+def is_already_imported(manifest_entry, file_hash):
+    if manifest_entry is None or manifest_entry["hash"] != file_hash:
+        return False
+    return all([unreal.EditorAssetLibrary.does_asset_exist(cur_path) for cur_path in manifest_entry["asset_paths"]])
+
+
+
+def import_fbx_meshes_batched(fbx_dir, destination_path, chunk_size=32, manifest_path=None, report_path=None, asset_tools=None):
+    """
+    Imports all FBX files of a folder as static meshes.
+
+    - all tasks share one import options object
+    - the tasks get imported in chunks, every chunk gets saved once
+    - meshes with the same source hash as in the manifest (and existing assets) get skipped
+    - writes an import report with the timing of every mesh
+
+    destination_path -> Unreal path, for example /Game/3xM/3D_models
+    manifest_path -> default is fbx_dir/import_manifest.json
+    report_path -> default is fbx_dir/import_report.json
+    asset_tools -> for example a stand-in for tests, default is the asset tools of the editor
+
+    The import time of a mesh is the time of its chunk divided by the chunk size (chunk_size=1 for exact times).
+    """
+    if manifest_path is None:
+        manifest_path = os.path.join(fbx_dir, "import_manifest.json")
+    if report_path is None:
+        report_path = os.path.join(fbx_dir, "import_report.json")
+    if asset_tools is None:
+        asset_tools = unreal.AssetToolsHelpers.get_asset_tools()
+
+    start_time = time.time()
+    manifest = load_import_manifest(manifest_path)
+    fbx_import_options = create_static_mesh_import_options()
+
+    # find meshes which need an import
+    report = []
+    jobs = []
+    for cur_fbx_file in sorted(os.listdir(fbx_dir)):
+        cur_path = os.path.join(fbx_dir, cur_fbx_file)
+        if not (os.path.isfile(cur_path) and cur_path.lower().endswith(".fbx")):
+            continue
+
+        hash_start = time.time()
+        cur_hash = get_file_hash(cur_path)
+        cur_report = {"file": cur_fbx_file, "hash_time": time.time()-hash_start}
+
+        if is_already_imported(manifest.get(cur_fbx_file), cur_hash):
+            cur_report.update({"status": "skipped", "asset_paths": manifest[cur_fbx_file]["asset_paths"], "import_time": 0.0})
+            report += [cur_report]
+        else:
+            jobs += [(cur_fbx_file, cur_hash, cur_report,
+                      create_static_mesh_import_task(cur_path, destination_path, fbx_import_options))]
+
+    print(f"Importing {len(jobs)} meshes, skipping {len(report)} unchanged meshes")
+
+    for chunk_idx in range(0, len(jobs), chunk_size):
+        cur_jobs = jobs[chunk_idx:chunk_idx+chunk_size]
+
+        chunk_start = time.time()
+        asset_tools.import_asset_tasks([cur_task for _, _, _, cur_task in cur_jobs])
+        unreal.EditorLoadingAndSavingUtils.save_dirty_packages(False, True)
+        chunk_time = time.time() - chunk_start
+
+        for cur_fbx_file, cur_hash, cur_report, cur_task in cur_jobs:
+            cur_asset_paths = [str(cur_path) for cur_path in cur_task.imported_object_paths]
+            cur_report.update({"status": "imported" if len(cur_asset_paths) > 0 else "failed",
+                               "asset_paths": cur_asset_paths,
+                               "import_time": chunk_time / len(cur_jobs)})
+            report += [cur_report]
+            if len(cur_asset_paths) > 0:
+                manifest[cur_fbx_file] = {"hash": cur_hash, "asset_paths": cur_asset_paths}
+
+        # manifest only contains saved assets
+        save_import_manifest(manifest, manifest_path)
+        print(f"Imported {min(chunk_idx+chunk_size, len(jobs))}/{len(jobs)} meshes ({time.time()-start_time:.1f}s)")
+
+    with open(report_path, "w") as report_file:
+        json.dump(report, report_file, indent=4)
+
+    statuses = [cur_report["status"] for cur_report in report]
+    print(f"Finished in {time.time()-start_time:.1f}s: imported {statuses.count('imported')}, " +
+          f"skipped {statuses.count('skipped')}, failed {statuses.count('failed')}")
+    return report
+
+
+
+if __name__ == "__main__":
+    fbx_dir = "D:/Informatik/Projekte/3xM/model_material/final_models"
+    destination = "/Game/3xM/3D_models"
+
+    import_fbx_meshes_batched(fbx_dir, destination, chunk_size=32)
 
+    # for cur_fbx_file in os.listdir(fbx_dir):
+    #     cur_path = os.path.join(fbx_dir, cur_fbx_file)
+    #     if os.path.isfile(cur_path) and cur_path.endswith(".fbx"):
+    #         imported_assets = import_fbx_as_static_mesh(cur_path, destination)
+    #         print("Imported assets:", imported_assets)
 
@@ -1,6 +1,29 @@
 import os
+import csv
+import json
+import time
 import unreal
 
+# class names -> {normalized asset name: package path}, built once per run
+ASSET_INDEX = dict()
+
+# map name -> (parameter name, material property, sampler type, output, default texture) of the shared parent material
+# - the textures get imported with the default settings (sRGB color) -> color sampler, only the normal map is a normal map
+# - grayscale maps only use the red channel
+# - the default texture is used if a material has no texture for the map -> neutral values (no metal, no occlusion)
+MATERIAL_PARAMETERS = {
+    "base_color": ("BaseColor", unreal.MaterialProperty.MP_BASE_COLOR, unreal.MaterialSamplerType.SAMPLERTYPE_COLOR,
+                   "", "/Engine/EngineResources/WhiteSquareTexture"),
+    "metallic": ("Metallic", unreal.MaterialProperty.MP_METALLIC, unreal.MaterialSamplerType.SAMPLERTYPE_COLOR,
+                 "R", "/Engine/EngineResources/Black"),
+    "normal": ("Normal", unreal.MaterialProperty.MP_NORMAL, unreal.MaterialSamplerType.SAMPLERTYPE_NORMAL,
+               "", "/Engine/EngineMaterials/FlatNormal"),
+    "roughness": ("Roughness", unreal.MaterialProperty.MP_ROUGHNESS, unreal.MaterialSamplerType.SAMPLERTYPE_COLOR,
+                  "R", "/Engine/EngineResources/WhiteSquareTexture"),
+    "ao": ("AmbientOcclusion", unreal.MaterialProperty.MP_AMBIENTOCCLUSION, unreal.MaterialSamplerType.SAMPLERTYPE_COLOR,
+           "R", "/Engine/EngineResources/WhiteSquareTexture")
+}
+
 
 
 def import_texture(file_path, destination_path, name):
@@ -23,6 +46,57 @@ def import_texture(file_path, destination_path, name):
 
 
 
+def create_texture_import_task(file_path, destination_path, name):
+    # like import_texture, but without saving -> the packages get saved once after the batch
+    task = unreal.AssetImportTask()
+    task.set_editor_property('filename', file_path)
+    task.set_editor_property('destination_path', destination_path)
+    task.set_editor_property('destination_name', name)
+    task.set_editor_property('replace_existing', True)
+    task.set_editor_property('automated', True)
+    task.set_editor_property('save', False)
+    return task
+
+
+
+def import_textures_batched(textures, chunk_size=None, asset_tools=None):
+    """
+    Imports many textures with one import_asset_tasks call (or one call per chunk) 
+    and saves all dirty content packages once at the end (not the open map).
+
+    textures -> list of (file path, destination path, name)
+    chunk_size -> None imports all textures in one call
+    asset_tools -> for example a stand-in for tests, default is the asset tools of the editor
+
+    Returns the imported object paths.
+    """
+    if asset_tools is None:
+        asset_tools = unreal.AssetToolsHelpers.get_asset_tools()
+
+    tasks = [create_texture_import_task(file_path, destination_path, name) for file_path, destination_path, name in textures]
+    if chunk_size is None:
+        chunk_size = max(len(tasks), 1)
+
+    start_time = time.time()
+    imported_paths = []
+    for chunk_idx in range(0, len(tasks), chunk_size):
+        cur_tasks = tasks[chunk_idx:chunk_idx+chunk_size]
+        asset_tools.import_asset_tasks(cur_tasks)
+        for cur_task in cur_tasks:
+            imported_paths += list(cur_task.get_editor_property('imported_object_paths'))
+        print(f"Imported {min(chunk_idx+chunk_size, len(tasks))}/{len(tasks)} textures ({time.time()-start_time:.1f}s)")
+
+    # save all dirty content packages once, the open map stays untouched
+    unreal.EditorLoadingAndSavingUtils.save_dirty_packages(False, True)
+    print(f"Saved all imported textures ({time.time()-start_time:.1f}s)")
+
+    # new assets -> the asset index has to be rebuilt
+    clear_asset_index()
+
+    return imported_paths
+
+
+
 def create_material_with_image_maps(material_name, texture_color, texture_metal, texture_normal, texture_roughness, texture_height, texture_ambient_occlusion):
     material_path = '/Game/3xM/Materials/' + material_name
 
@@ -176,184 +250,352 @@ def create_material_with_uasset_maps_by_names(material_name, base_color_asset_na
 
 
 
-def find_and_load_asset_by_name(asset_name, class_name=["Texture2D"]):
-    # create reference to  Asset-Registry
-    asset_registry = unreal.AssetRegistryHelpers.get_asset_registry()
-    
-    # filter to search texture
-    search_filter = unreal.ARFilter(class_names=class_name, package_paths=["/Game/"], recursive_paths=True)
-    
-    # search for assets
-    assets = asset_registry.get_assets(search_filter)
+def normalize_asset_name(asset_name):
+    return str(asset_name).lower()
+
+
+
+def build_asset_index(class_names=["Texture2D"], package_paths=["/Game/"], asset_registry=None):
+    """
+    Searches the asset registry once and returns {normalized asset name: package path}.
+
+    asset_registry -> for example a stand-in for tests, default is the asset registry of the editor
+    """
+    if asset_registry is None:
+        asset_registry = unreal.AssetRegistryHelpers.get_asset_registry()
+
+    search_filter = unreal.ARFilter(class_names=class_names, package_paths=package_paths, recursive_paths=True)
+
+    asset_index = dict()
+    for asset_data in asset_registry.get_assets(search_filter):
+        # first result wins, like the linear search before
+        asset_index.setdefault(normalize_asset_name(asset_data.asset_name), str(asset_data.package_name))
+    return asset_index
+
+
+
+def get_asset_index(class_names=["Texture2D"], refresh=False, asset_registry=None):
+    """
+    Returns the cached asset index for the class names and builds it on first use (or if refresh is True).
+    """
+    key = tuple(class_names)
+    if refresh or key not in ASSET_INDEX:
+        ASSET_INDEX[key] = build_asset_index(class_names=class_names, asset_registry=asset_registry)
+        print(f"Indexed {len(ASSET_INDEX[key])} assets of {', '.join(class_names)}")
+    return ASSET_INDEX[key]
+
+
+
+def clear_asset_index():
+    # call after imports -> the next lookup rebuilds the index
+    ASSET_INDEX.clear()
+
+
+
+def find_asset_path(asset_name, asset_index):
+    """
+    Exact name match first, if there is none the first asset which contains the name.
+    """
+    name = normalize_asset_name(asset_name)
+    if name in asset_index:
+        return asset_index[name]
+
+    for cur_name, cur_path in asset_index.items():
+        if name in cur_name:
+            return cur_path
+    return None
+
+
+
+def find_and_load_asset_by_name(asset_name, class_name=["Texture2D"], asset_index=None):
+    if asset_index is None:
+        asset_index = get_asset_index(class_names=class_name)
+
+    asset_path = find_asset_path(asset_name, asset_index)
+    if asset_path is None:
+        print(f"No Asset with name {asset_name} found.")
+        return None
+
+    print(f"Asset found: {asset_path}")
     
-    # go through results -> should only get one result
-    for asset_data in assets:
-        if asset_name.lower() in str(asset_data.asset_name).lower():
-            asset_path = str(asset_data.package_name)
-            print(f"Asset found: {asset_path}")
-            
-            # load asset
-            asset = unreal.EditorAssetLibrary.load_asset(asset_path)
-            
-            if asset:
-                print(f"Asset successfull loaded: {asset}")
-                return asset
-            else:
-                print(f"Failed loading Asset: {asset_name}")
+    # load asset
+    asset = unreal.EditorAssetLibrary.load_asset(asset_path)
     
-    print(f"No Asset with name {asset_name} found.")
-    return None
+    if asset:
+        print(f"Asset successfull loaded: {asset}")
+        return asset
+    else:
+        print(f"Failed loading Asset: {asset_name}")
+        return None
+
 
 
+def save_material_manifest(material_specs, manifest_path):
+    """
+    material_specs -> {material name: {map name: texture asset name or package path}}
 
-# Neue Zeile in die Data Table einfügen
-def add_all_materials_to_datatable(source_path):
-    data_table_path = '/Game/material_data_table'
-    data_table = unreal.EditorAssetLibrary.load_asset(data_table_path)  
-    #  data_table = find_and_load_asset_by_name("material_data_table", class_names=["Data Table"])
+    Map names are the keys of MATERIAL_PARAMETERS.
+    """
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(material_specs, manifest_file, indent=4)
 
-    print(dir(data_table))
 
-    existing_rows = data_table.get_editor_property("RowMap")
 
-    # Check, if Data Table got loaded
-    if data_table:
-        for cur_file in os.listdir(source_path):
-            cur_name = cur_file.split(".")[0]
-            material_path = f'/Game/3xM/Materials/{cur_name}'
-            material_asset = unreal.EditorAssetLibrary.load_asset(material_path)
-            # material_asset = find_and_load_asset_by_name(cur_name, class_names=["Material"])
+def load_material_manifest(manifest_path):
+    with open(manifest_path, "r") as manifest_file:
+        return json.load(manifest_file)
 
-            row_name = unreal.Name(cur_name)
-        
-            # Prüfen, ob die Zeile bereits existiert
-            if row_name in existing_rows:
-                unreal.log_warning(f"Row {cur_name} already exists in the Data Table")
+
+
+def create_parent_material(material_name="3xM_Parent_Material", base_path="/Game/3xM/Materials", asset_tools=None):
+    """
+    Creates (or loads) the shared parent material with one texture parameter per map.
+    """
+    material_path = f"{base_path}/{material_name}"
+    if unreal.EditorAssetLibrary.does_asset_exist(material_path):
+        return unreal.EditorAssetLibrary.load_asset(material_path)
+
+    if asset_tools is None:
+        asset_tools = unreal.AssetToolsHelpers.get_asset_tools()
+    material = asset_tools.create_asset(material_name, base_path, unreal.Material, unreal.MaterialFactoryNew())
+
+    material_editor = unreal.MaterialEditingLibrary
+    for idx, (parameter_name, material_property, sampler_type, output_name, default_texture) in enumerate(MATERIAL_PARAMETERS.values()):
+        cur_sample = material_editor.create_material_expression(material, unreal.MaterialExpressionTextureSampleParameter2D, -384, -150*idx)
+        cur_sample.set_editor_property('parameter_name', parameter_name)
+        cur_sample.set_editor_property('sampler_type', sampler_type)
+        # texture parameters need a default texture to compile
+        cur_sample.set_editor_property('texture', unreal.EditorAssetLibrary.load_asset(default_texture))
+        material_editor.connect_material_property(cur_sample, output_name, material_property)
+
+    material_editor.recompile_material(material)
+    return material
+
+
+
+def create_materials_from_manifest(manifest_path, base_path="/Game/3xM/Materials", texture_path="/Game/3xM/Textures", 
+                                   parent_material_name="3xM_Parent_Material", asset_tools=None):
+    """
+    Creates one material instance of a shared parent material for every material in the manifest 
+    (see save_material_manifest).
+
+    The texture folder gets scanned once, the textures are found with the asset index 
+    and all materials get saved in one batch at the end.
+    Existing assets which are no material instance (for example a plain material) get deleted and recreated.
+
+    Returns the number of created material instances.
+    """
+    start_time = time.time()
+    material_specs = load_material_manifest(manifest_path)
+
+    if asset_tools is None:
+        asset_tools = unreal.AssetToolsHelpers.get_asset_tools()
+
+    unreal.AssetRegistryHelpers.get_asset_registry().scan_paths_synchronous([texture_path])
+    asset_index = get_asset_index(class_names=["Texture2D"], refresh=True)
+
+    parent_material = create_parent_material(material_name=parent_material_name, base_path=base_path, asset_tools=asset_tools)
+    material_editor = unreal.MaterialEditingLibrary
+
+    created = 0
+    for material_name, maps in material_specs.items():
+        material_path = f"{base_path}/{material_name}"
+        material_instance = None
+        if unreal.EditorAssetLibrary.does_asset_exist(material_path):
+            material_instance = unreal.EditorAssetLibrary.load_asset(material_path)
+            # for example an old material of create_material_with_image_maps -> replace it with an instance
+            if not isinstance(material_instance, unreal.MaterialInstanceConstant):
+                print(f"{material_name} is no material instance -> recreated")
+                material_instance = None
+                if not unreal.EditorAssetLibrary.delete_asset(material_path):
+                    print(f"Could not delete {material_path} -> skipped")
+                    continue
+        if material_instance is None:
+            material_instance = asset_tools.create_asset(material_name, base_path, unreal.MaterialInstanceConstant, 
+                                                         unreal.MaterialInstanceConstantFactoryNew())
+        if material_instance is None:
+            print(f"Could not create material {material_name}")
+            continue
+
+        material_editor.set_material_instance_parent(material_instance, parent_material)
+
+        for map_name, texture_name in maps.items():
+            if not texture_name or map_name not in MATERIAL_PARAMETERS:
+                continue
+            # package path or asset name
+            if texture_name.startswith("/"):
+                cur_texture_path = texture_name
+            else:
+                cur_texture_path = find_asset_path(texture_name, asset_index)
+            cur_texture = unreal.EditorAssetLibrary.load_asset(cur_texture_path) if cur_texture_path else None
+            if cur_texture is None:
+                print(f"No texture {texture_name} found for {material_name}")
                 continue
+            material_editor.set_material_instance_texture_parameter_value(material_instance, MATERIAL_PARAMETERS[map_name][0], cur_texture)
+
+        created += 1
+
+    # save all dirty content packages once, the open map stays untouched
+    unreal.EditorLoadingAndSavingUtils.save_dirty_packages(False, True)
+    print(f"Created {created}/{len(material_specs)} materials in {time.time()-start_time:.1f}s")
+    return created
+
+
+
+def create_datatable_rows(source_path, base_path="/Game/3xM/Materials", name_prefix=None):
+    """
+    Returns the rows of the material data table: [(row name, soft object path of the material)]
+
+    source_path -> folder with the material assets (for example Content/3xM/Materials)
+    name_prefix -> only materials starting with it (for example to skip the parent material)
+    """
+    rows = []
+    for cur_file in sorted(os.listdir(source_path)):
+        cur_name = cur_file.split(".")[0]
+        if name_prefix and not cur_name.startswith(name_prefix):
+            continue
+        rows += [(cur_name, f"{base_path}/{cur_name}.{cur_name}")]
+    return rows
+
 
-            # Neue Zeile als Dictionary vorbereiten (der Feldname 'Material' ist beispielhaft)
-            new_row = {"material": material_asset}
-
-            # Die Data Table modifizieren und die neue Zeile hinzufügen
-            data_table.modify()
-            existing_rows[row_name] = new_row
-            data_table.set_editor_property("RowMap", existing_rows)
-
-            # new_row = unreal.DataTableRow(row_struct)
-            # new_row.material = material_asset
-
-            # # Füge die Zeile zur Data Table hinzu
-            # row_name = unreal.Name(cur_name)
-            # data_table.add_row(row_name, new_row)
-
-            # new_row = unreal.DataTableRowHandle()
-            # new_row.row_name = unreal.Name(cur_name)
-
-            # # struct_type = unreal.find_class("material_data_table_struct")  
-            # # struct_type = unreal.EditorAssetLibrary.load_asset(struct_path).get_class()
-            # struct_type = unreal.EditorAssetLibrary.load_asset("material_data_table_struct").get_class()
-            # new_row_data = unreal.StructBase(struct_type)
-
-            # unreal.StructBase.set_editor_property(new_row_data, "material", material_asset)
-
-            # success = data_table.add_row(new_row.row_name, new_row_data)
-
-            # Load the Blueprint structure
-            # struct_path = '/Game/material_data_table_struct'
-            # struct = unreal.EditorAssetLibrary.load_blueprint_class(struct_path)
-            # struct = unreal.EditorAssetLibrary.load_asset(struct_path)
-
-            # Create Structure
-            # new_row = unreal.new_object(struct.get_class())
-            # new_row = unreal.StructBase(struct)  # Create an instance of the Blueprint structure
-                
-            # Manually set attributes
-            # new_row.set_editor_property('material', material_asset)
-            # new_row.material = material_asset
-
-            # unreal.EditorAssetLibrary.add_data_table_row(data_table, cur_name, material_asset)
-            
-            # Add the row data to the table
-            # data_table.add_row(cur_name, material_asset)
-            
-            # # Fill the fields
-            # new_row.RowName = cur_name
-            # new_row.material = material_asset
-            
-            # # Add the row data to the table
-            # data_table.add_row(row_name, material_asset)
-            print(f"Material {row_name} succefully added.")
+
+def export_datatable_rows(rows, output_path):
+    """
+    Writes the rows as CSV or JSON (by file ending) in the format of the Unreal data table import.
+    """
+    if output_path.lower().endswith(".json"):
+        with open(output_path, "w") as output_file:
+            json.dump([{"Name": row_name, "material": material_path} for row_name, material_path in rows], output_file, indent=4)
     else:
+        with open(output_path, "w", newline="") as output_file:
+            writer = csv.writer(output_file)
+            writer.writerow(["---", "material"])
+            writer.writerows(rows)
+
+
+
+def fill_datatable(data_table_path, rows_path):
+    """
+    Fills the data table in one operation with a generated CSV/JSON file (replaces all rows).
+    """
+    data_table = unreal.EditorAssetLibrary.load_asset(data_table_path)
+    if not data_table:
         print(f"Error: Data Table could not get loaded.")
+        return False
 
+    with open(rows_path, "r") as rows_file:
+        rows_string = rows_file.read()
 
+    if rows_path.lower().endswith(".json"):
+        success = unreal.DataTableFunctionLibrary.fill_data_table_from_json_string(data_table, rows_string)
+    else:
+        success = unreal.DataTableFunctionLibrary.fill_data_table_from_csv_string(data_table, rows_string)
 
-print("#"*12)
-print("Start Material Import")
-MAKE_TEXTURES = False
-MAKE_MATERIALS = False
-MAKE_DATATABLE = False
-source_path = "D:/Informatik/Projekte/3xM/final_materials_UE"
-dest_path = "/Game/3xM/Textures"
-ending = ".png"
-
-success = 0
-fail = 0
-idx = 0
-for cur_dir in os.listdir(source_path):
-    cur_path = os.path.join(source_path, cur_dir)
-
-    color_path = os.path.join(cur_path, f"color{ending}")
-    metal_path = os.path.join(cur_path, f"metal{ending}")
-    roughness_path = os.path.join(cur_path, f"roughness{ending}")
-    normal_path = os.path.join(cur_path, f"normal{ending}")
-    height_path = os.path.join(cur_path, f"height{ending}")
-    ao_path = os.path.join(cur_path, f"ambient_occlusion{ending}")
-
-    if os.path.exists(os.path.join(cur_path, color_path)) and \
-        os.path.exists(os.path.join(cur_path, metal_path)) and \
-        os.path.exists(os.path.join(cur_path, roughness_path)) and \
-        os.path.exists(os.path.join(cur_path, normal_path)): # and \
-        # os.path.exists(os.path.join(cur_path, height_path)) and \
-        # os.path.exists(os.path.join(cur_path, ao_path)):
-
-        # import textures
-        if MAKE_TEXTURES:
-            import_texture(color_path, f"{dest_path}/{cur_dir}", f"3xM_Color_{idx}")
-            import_texture(metal_path, f"{dest_path}/{cur_dir}", f"3xM_Metal_{idx}")
-            import_texture(roughness_path, f"{dest_path}/{cur_dir}", f"3xM_Roughness_{idx}")
-            import_texture(normal_path, f"{dest_path}/{cur_dir}", f"3xM_Normal_{idx}")
-            # import_texture(height_path, f"{dest_path}/{cur_dir}", f"3xM_Height_{idx}")
-            # import_texture(ao_path, f"{dest_path}/{cur_dir}", f"3xM_AO_{idx}")
-
-        if MAKE_TEXTURES:
-            cur_idx = idx
-        else:
-            cur_idx = cur_dir.split("_")[-1]
-        color_path = f"{dest_path}/{cur_dir}/3xM_Color_{cur_idx}.uasset"
-        metal_path = f"{dest_path}/{cur_dir}/3xM_Metal_{cur_idx}.uasset"
-        roughness_path = f"{dest_path}/{cur_dir}/3xM_Roughness_{cur_idx}.uasset"
-        normal_path = f"{dest_path}s/{cur_dir}/3xM_Normal_{cur_idx}.uasset"
-        ao_path = f"{dest_path}s/{cur_dir}/3xM_AO_{cur_idx}.uasset"
-
-        if MAKE_MATERIALS:
-            # create_material_with_image_maps(
-            create_material_with_uasset_maps_by_names(
-                            material_name=f"3xM_Material_ID_{idx}", 
-                            base_color_asset_name=f"3xM_Color_{cur_idx}", 
-                            metallic_asset_name=f"3xM_Metal_{cur_idx}", 
-                            roughness_asset_name=f"3xM_Roughness_{cur_idx}", 
-                            normal_asset_name=f"3xM_Normal_{cur_idx}", 
-                            ao_asset_name=None)
-                    
-        idx += 1
-        success += 1
+    if success:
+        unreal.EditorAssetLibrary.save_loaded_asset(data_table)
+        print(f"Filled {data_table_path} from {rows_path}")
     else:
-        fail += 1
+        print(f"Error: Could not fill {data_table_path} from {rows_path}")
+    return success
+
+
+
+def add_all_materials_to_datatable(source_path, data_table_path='/Game/material_data_table', rows_path=None, name_prefix="3xM_Material_ID_"):
+    """
+    Generates the complete data table contents (material name -> material) 
+    and fills the data table in one operation.
+
+    rows_path -> where the generated CSV/JSON gets saved, default is the Saved folder of the project
+    """
+    if rows_path is None:
+        # not inside of Content -> no auto import of the CSV
+        rows_path = os.path.join(unreal.Paths.project_saved_dir(), "material_data_table.csv")
+
+    rows = create_datatable_rows(source_path, name_prefix=name_prefix)
+    export_datatable_rows(rows, rows_path)
+    print(f"Exported {len(rows)} materials to {rows_path}")
+
+    return fill_datatable(data_table_path, rows_path)
+
+
+
+if __name__ == "__main__":
+    print("#"*12)
+    print("Start Material Import")
+    MAKE_TEXTURES = False
+    MAKE_MATERIALS = False
+    MAKE_DATATABLE = False
+    source_path = "D:/Informatik/Projekte/3xM/final_materials_UE"
+    dest_path = "/Game/3xM/Textures"
+    ending = ".png"
+
+    success = 0
+    fail = 0
+    idx = 0
+    texture_imports = []
+    material_specs = dict()
+    for cur_dir in os.listdir(source_path):
+        cur_path = os.path.join(source_path, cur_dir)
+
+        color_path = os.path.join(cur_path, f"color{ending}")
+        metal_path = os.path.join(cur_path, f"metal{ending}")
+        roughness_path = os.path.join(cur_path, f"roughness{ending}")
+        normal_path = os.path.join(cur_path, f"normal{ending}")
+        height_path = os.path.join(cur_path, f"height{ending}")
+        ao_path = os.path.join(cur_path, f"ambient_occlusion{ending}")
+
+        if os.path.exists(os.path.join(cur_path, color_path)) and \
+            os.path.exists(os.path.join(cur_path, metal_path)) and \
+            os.path.exists(os.path.join(cur_path, roughness_path)) and \
+            os.path.exists(os.path.join(cur_path, normal_path)): # and \
+            # os.path.exists(os.path.join(cur_path, height_path)) and \
+            # os.path.exists(os.path.join(cur_path, ao_path)):
+
+            # import textures -> collected and imported as one batch after the loop
+            if MAKE_TEXTURES:
+                texture_imports += [(color_path, f"{dest_path}/{cur_dir}", f"3xM_Color_{idx}"),
+                                    (metal_path, f"{dest_path}/{cur_dir}", f"3xM_Metal_{idx}"),
+                                    (roughness_path, f"{dest_path}/{cur_dir}", f"3xM_Roughness_{idx}"),
+                                    (normal_path, f"{dest_path}/{cur_dir}", f"3xM_Normal_{idx}")]
+                                    # (height_path, f"{dest_path}/{cur_dir}", f"3xM_Height_{idx}")
+                                    # (ao_path, f"{dest_path}/{cur_dir}", f"3xM_AO_{idx}")
+
+            if MAKE_TEXTURES:
+                cur_idx = idx
+            else:
+                cur_idx = cur_dir.split("_")[-1]
+            color_path = f"{dest_path}/{cur_dir}/3xM_Color_{cur_idx}.uasset"
+            metal_path = f"{dest_path}/{cur_dir}/3xM_Metal_{cur_idx}.uasset"
+            roughness_path = f"{dest_path}/{cur_dir}/3xM_Roughness_{cur_idx}.uasset"
+            normal_path = f"{dest_path}s/{cur_dir}/3xM_Normal_{cur_idx}.uasset"
+            ao_path = f"{dest_path}s/{cur_dir}/3xM_AO_{cur_idx}.uasset"
+
+            # materials need the imported textures -> created after the texture import
+            if MAKE_MATERIALS:
+                material_specs[f"3xM_Material_ID_{idx}"] = {
+                                "base_color": f"3xM_Color_{cur_idx}", 
+                                "metallic": f"3xM_Metal_{cur_idx}", 
+                                "roughness": f"3xM_Roughness_{cur_idx}", 
+                                "normal": f"3xM_Normal_{cur_idx}", 
+                                "ao": None}
+
+            idx += 1
+            success += 1
+        else:
+            fail += 1
+
+    if MAKE_TEXTURES:
+        import_textures_batched(texture_imports, chunk_size=None)
+
+    if MAKE_MATERIALS:
+        # one material instance per material (old way: create_material_with_uasset_maps_by_names)
+        manifest_path = os.path.join(source_path, "material_manifest.json")
+        save_material_manifest(material_specs, manifest_path)
+        create_materials_from_manifest(manifest_path)
 
-print(f"Finished Importing: Success: {success}\nFailed: {fail}")
+    print(f"Finished Importing: Success: {success}\nFailed: {fail}")
 
 
-if MAKE_DATATABLE:
-    add_all_materials_to_datatable(source_path="D:/Informatik/Unreal Engine/dataset_gen_3xM/Content/3xM/Materials")
+    if MAKE_DATATABLE:
+        add_all_materials_to_datatable(source_path="D:/Informatik/Unreal Engine/dataset_gen_3xM/Content/3xM/Materials")
 
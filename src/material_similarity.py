@@ -1,9 +1,125 @@
 import os
 import shutil
+import hashlib
+from collections import OrderedDict
 import cv2
 from skimage.metrics import structural_similarity as ssim
 import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
 from transform_materials import cv_img_is_none
+from image_probe import is_image_valid
+
+MATERIAL_TEXTURES = ['normal.jpg', 'color.jpg', 'metal.jpg', 'roughness.jpg']
+
+class TextureCache:
+    """
+    LRU cache of decoded grayscale textures, bounded by bytes.
+
+    Every texture gets decoded (and resized to texture_size x texture_size, None keeps the original resolution) only once per run.
+    The default keeps the original resolution, so the cache only changes the speed and not the scores.
+    The key is the path and the modification time, so changed files get decoded again.
+    With a cache_dir the decoded textures are also saved as .npy files and can be reused in the next run.
+
+    The downsampled textures of get_downsampled have their own budget (max_downsampled_bytes),
+    so they never push the textures out.
+
+    The pairwise comparison visits the textures of a category cyclically -> max_bytes should fit all
+    textures of the biggest category, else most lookups are misses (512x512 -> 256 KB per texture).
+    """
+    def __init__(self, max_bytes=2*1024**3, texture_size=None, cache_dir=None, max_downsampled_bytes=256*1024**2):
+        self.max_bytes = max_bytes
+        self.max_downsampled_bytes = max_downsampled_bytes
+        self.texture_size = texture_size
+        self.cache_dir = cache_dir
+        self.textures = OrderedDict()
+        self.downsampled = OrderedDict()
+        self.n_bytes = 0
+        self.n_downsampled_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, texture_path):
+        return (os.path.abspath(texture_path), os.path.getmtime(texture_path))
+
+    def get_npy_path(self, key):
+        path, mtime = key
+        name = f"{hashlib.md5(path.encode()).hexdigest()}_{int(mtime*1000)}_{self.texture_size}.npy"
+        return os.path.join(self.cache_dir, name)
+
+    def load(self, texture_path):
+        img = cv2.imread(texture_path, cv2.IMREAD_GRAYSCALE)
+        if cv_img_is_none(img):
+            return None
+        if self.texture_size:
+            img = cv2.resize(img, (self.texture_size, self.texture_size), interpolation=cv2.INTER_AREA)
+        return img
+
+    def save_npy(self, npy_path, img):
+        # workers share the cache dir -> write to an own temp file and rename, so no one sees a half written file
+        tmp_path = f"{npy_path[:-4]}_{os.getpid()}.tmp.npy"
+        np.save(tmp_path, img)
+        os.replace(tmp_path, npy_path)
+
+    def get(self, texture_path):
+        """
+        Returns the decoded grayscale texture or None, if the texture could not be loaded.
+        """
+        key = self.get_key(texture_path)
+        if key in self.textures:
+            self.hits += 1
+            self.textures.move_to_end(key)
+            return self.textures[key]
+
+        self.misses += 1
+        img = None
+        npy_path = self.get_npy_path(key) if self.cache_dir else None
+        if npy_path and os.path.exists(npy_path):
+            try:
+                img = np.load(npy_path)
+            except (OSError, ValueError, EOFError):
+                # broken file -> same as a miss
+                img = None
+
+        if img is None:
+            img = self.load(texture_path)
+            if npy_path and img is not None:
+                self.save_npy(npy_path, img)
+
+        if img is not None:
+            self.add(key, img)
+        return img
+
+    def add(self, key, img):
+        self.textures[key] = img
+        self.n_bytes += img.nbytes
+        while self.n_bytes > self.max_bytes and len(self.textures) > 1:
+            _, removed_img = self.textures.popitem(last=False)
+            self.n_bytes -= removed_img.nbytes
+
+    def get_downsampled(self, texture_path, size):
+        """
+        Returns the texture downsampled to size x size (also cached, but not saved to disk).
+        """
+        key = self.get_key(texture_path) + (size,)
+        if key in self.downsampled:
+            self.hits += 1
+            self.downsampled.move_to_end(key)
+            return self.downsampled[key]
+
+        img = self.get(texture_path)
+        if img is None:
+            return None
+        img = cv2.resize(img, (size, size), interpolation=cv2.INTER_AREA)
+
+        self.downsampled[key] = img
+        self.n_downsampled_bytes += img.nbytes
+        while self.n_downsampled_bytes > self.max_downsampled_bytes and len(self.downsampled) > 1:
+            _, removed_img = self.downsampled.popitem(last=False)
+            self.n_downsampled_bytes -= removed_img.nbytes
+        return img
 
 # Function to calculate SSIM-based image similarity
 def calculate_similarity(img_1, img_2):
@@ -15,38 +131,120 @@ def calculate_similarity(img_1, img_2):
             print(f"Resizing metal image from {img_1.shape} to {img_2.shape}  ")
             img_1 = cv2.resize(img_1, (img_2.shape[1], img_2.shape[0]))
 
-    score, _ = ssim(cv2.cvtColor(img_1, cv2.COLOR_BGR2GRAY), cv2.cvtColor(img_2, cv2.COLOR_BGR2GRAY), full=True)
+    if img_1.ndim == 3:
+        img_1 = cv2.cvtColor(img_1, cv2.COLOR_BGR2GRAY)
+    if img_2.ndim == 3:
+        img_2 = cv2.cvtColor(img_2, cv2.COLOR_BGR2GRAY)
+
+    # only the scalar score is needed -> no full SSIM map
+    score = ssim(img_1, img_2)
     return score
 
+def find_category_materials(cur_category_path):
+    """
+    Finds all materials of one category with their valid textures (only the image header gets checked).
+
+    Returns a dict: material name -> [textures, material path]
+    """
+    materials = {}
+    # for cur_root_path, cur_dirs, cur_files in os.walk(material_folder):
+    for cur_material_folder in os.listdir(cur_category_path):
+        cur_material_path = os.path.join(cur_category_path, cur_material_folder)
+        # if len(cur_files) > 2:
+        if os.path.isdir(cur_material_path):
+            material_name = cur_material_folder    # cur_material_path.split("/")[-1]
+            material_path =cur_material_path    # "/".join(cur_material_path.split("/")[:-1])
+            textures = {}
+            for texture_name in MATERIAL_TEXTURES:
+                texture_path = os.path.join(cur_material_path, texture_name)
+                if os.path.exists(texture_path):
+                    if is_image_valid(texture_path):
+                        textures[texture_name] = texture_path
+            materials[material_name] = [textures, material_path]
+    return materials
+
+def compare_material_textures(mat_1, mat_2, texture_cache):
+    """
+    Returns the average SSIM score over all texture types both materials have.
+    """
+    similarity_scores = []
+    for texture_type in MATERIAL_TEXTURES:
+        if texture_type in mat_1 and texture_type in mat_2:
+            img_1 = texture_cache.get(mat_1[texture_type])
+            img_2 = texture_cache.get(mat_2[texture_type])
+            if img_1 is None or img_2 is None:
+                continue
+            similarity_score = calculate_similarity(img_1, img_2)
+            similarity_scores.append(similarity_score)
+    return np.mean(similarity_scores)
+
+def compare_material_textures_multiscale(mat_1, mat_2, texture_cache, similarity_threshold, levels=(32, 128), rejection_margin=0.1):
+    """
+    Compares two materials first on heavily downsampled textures (levels = texture sizes, from small to big).
+
+    If the average score of a level is more than rejection_margin below the similarity_threshold,
+    the pair gets rejected and the score of this level is returned. Only borderline and similar pairs
+    get escalated to the next level and at last to the full resolution.
+
+    Returns (score, decided level) -> level is the texture size or "full"
+    """
+    for cur_size in levels:
+        similarity_scores = []
+        for texture_type in MATERIAL_TEXTURES:
+            if texture_type in mat_1 and texture_type in mat_2:
+                img_1 = texture_cache.get_downsampled(mat_1[texture_type], cur_size)
+                img_2 = texture_cache.get_downsampled(mat_2[texture_type], cur_size)
+                if img_1 is None or img_2 is None:
+                    continue
+                similarity_scores.append(calculate_similarity(img_1, img_2))
+        if len(similarity_scores) == 0:
+            break
+
+        score = np.mean(similarity_scores)
+        if score < similarity_threshold - rejection_margin:
+            return score, cur_size
+
+    return compare_material_textures(mat_1, mat_2, texture_cache), "full"
+
+def print_level_report(level_counter):
+    total = sum(level_counter.values())
+    print(f"Decided pairs per level:")
+    for level, amount in level_counter.items():
+        print(f"    -> {level}: {amount} ({(amount/max(total, 1))*100:.1f}%)")
+
+def copy_similar_materials(compare_folder, name_1, path_1, name_2, path_2):
+    # Copy similar materials to the compare folder
+    mat1_folder = os.path.join(compare_folder, f"{name_1}-{name_2}", name_1)
+    mat2_folder = os.path.join(compare_folder, f"{name_1}-{name_2}", name_2)
+    if not os.path.exists(mat1_folder):
+        shutil.copytree(path_1, mat1_folder)
+    if not os.path.exists(mat2_folder):
+        shutil.copytree(path_2, mat2_folder)
+
 # Iterate through materials and compare them
-def compare_materials_and_copy(material_folder, compare_folder, similarity_threshold=0.9, start_index=0, clear=False):
+def compare_materials_and_copy(material_folder, compare_folder, similarity_threshold=0.9, start_index=0, clear=False,
+                               texture_cache=None, multiscale_levels=None, rejection_margin=0.1):
+    """
+    Compares all materials of a category pairwise with SSIM and copies similar materials to the compare folder.
+
+    texture_cache -> TextureCache to use, a new one (without disk cache) gets created if None
+    multiscale_levels -> texture sizes for the early rejection (for example (32, 128)), None compares only in full resolution
+    """
     if os.path.exists(compare_folder) and clear:
         shutil.rmtree(compare_folder)
     os.makedirs(compare_folder, exist_ok=True)
+
+    if texture_cache is None:
+        texture_cache = TextureCache()
     
+    level_counter = dict()
     counter = 0
     # go through evey category -> only compare the categories
     for cur_category in os.listdir(material_folder):
         print(f"Next Category: {cur_category}")
         cur_category_path = os.path.join(material_folder, cur_category)
 
-        materials = {}
-        # for cur_root_path, cur_dirs, cur_files in os.walk(material_folder):
-        for cur_material_folder in os.listdir(cur_category_path):
-            cur_material_path = os.path.join(cur_category_path, cur_material_folder)
-            # if len(cur_files) > 2:
-            if os.path.isdir(cur_material_path):
-                material_name = cur_material_folder    # cur_material_path.split("/")[-1]
-                material_path =cur_material_path    # "/".join(cur_material_path.split("/")[:-1])
-                material_textures = ['normal.jpg', 'color.jpg', 'metal.jpg', 'roughness.jpg']
-                textures = {}
-                for texture_name in material_textures:
-                    texture_path = os.path.join(cur_material_path, texture_name)
-                    if os.path.exists(texture_path):
-                        if not cv_img_is_none(cv2.imread(texture_path)):
-                            textures[texture_name] = texture_path
-                materials[material_name] = [textures, material_path]
-        
+        materials = find_category_materials(cur_category_path)
         material_names = list(materials.keys())
         
         # Compare and copy similar materials
@@ -56,38 +254,212 @@ def compare_materials_and_copy(material_folder, compare_folder, similarity_thres
                     mat_1, path_1 = materials[material_names[i]]
                     mat_2, path_2 = materials[material_names[j]]
                     
-                    similarity_scores = []
-                    for texture_type in ['normal.jpg', 'color.jpg', 'metal.jpg', 'roughness.jpg']:
-                        if texture_type in mat_1 and texture_type in mat_2:
-                            img_1 = cv2.imread(mat_1[texture_type])
-                            img_2 = cv2.imread(mat_2[texture_type])
-                            similarity_score = calculate_similarity(img_1, img_2)
-                            similarity_scores.append(similarity_score)
-                    average_similarity = np.mean(similarity_scores)
+                    if multiscale_levels:
+                        average_similarity, level = compare_material_textures_multiscale(mat_1, mat_2, texture_cache, similarity_threshold, 
+                                                                                         multiscale_levels, rejection_margin)
+                    else:
+                        average_similarity, level = compare_material_textures(mat_1, mat_2, texture_cache), "full"
+                    level_counter[level] = level_counter.get(level, 0) + 1
                     print(average_similarity)
                     
                     if average_similarity > similarity_threshold:
-                        # Copy similar materials to the compare folder
-                        mat1_folder = os.path.join(compare_folder, f"{material_names[i]}-{material_names[j]}", material_names[i])
-                        mat2_folder = os.path.join(compare_folder, f"{material_names[i]}-{material_names[j]}", material_names[j])
-                        if not os.path.exists(mat1_folder):
-                            shutil.copytree(path_1, mat1_folder)
-                        if not os.path.exists(mat2_folder):
-                            shutil.copytree(path_2, mat2_folder)
+                        copy_similar_materials(compare_folder, material_names[i], path_1, material_names[j], path_2)
                         print(f"Material {material_names[i]} and Material {material_names[j]} are similar with a similarity score of {average_similarity:.2f}")
 
                 counter += 1
                 with open(f"./saves/material_sim_last_index_{int(counter%3)}.txt", "w") as index_file:
                     index_file.write(f"Last Index Counter: {counter}")
+
+        print(f"Texture Cache: {texture_cache.hits} hits, {texture_cache.misses} misses")
+    print_level_report(level_counter)
     # if os.path.exists("./saves/material_sim_last_index.txt"):
     #     os.remove("./saves/material_sim_last_index.txt")
 
+# one texture cache per worker process
+worker_texture_cache = None
+
+def compare_pair_block(pair_block, texture_size=512, cache_dir=None, similarity_threshold=0.9, multiscale_levels=None, rejection_margin=0.1,
+                       max_bytes=2*1024**3, max_downsampled_bytes=256*1024**2):
+    """
+    Worker function for compare_materials_parallel.
+
+    pair_block -> list of (category, name_1, textures_1, name_2, textures_2)
+    max_bytes, max_downsampled_bytes -> budget of the texture cache of this worker
+
+    Returns a list of (category, name_1, name_2, score, decided level)
+    """
+    global worker_texture_cache
+    if worker_texture_cache is None or \
+            (worker_texture_cache.texture_size, worker_texture_cache.cache_dir, worker_texture_cache.max_bytes, 
+             worker_texture_cache.max_downsampled_bytes) != (texture_size, cache_dir, max_bytes, max_downsampled_bytes):
+        worker_texture_cache = TextureCache(max_bytes=max_bytes, texture_size=texture_size, cache_dir=cache_dir, 
+                                            max_downsampled_bytes=max_downsampled_bytes)
+
+    results = []
+    for category, name_1, mat_1, name_2, mat_2 in pair_block:
+        if multiscale_levels:
+            score, level = compare_material_textures_multiscale(mat_1, mat_2, worker_texture_cache, similarity_threshold, 
+                                                                multiscale_levels, rejection_margin)
+        else:
+            score, level = compare_material_textures(mat_1, mat_2, worker_texture_cache), "full"
+        results.append((category, name_1, name_2, float(score), level))
+    return results
+
+def get_similarity_settings(texture_size, multiscale_levels, similarity_threshold, rejection_margin):
+    """
+    Header line of the results file -> all settings which change the scores.
+    """
+    levels = tuple(multiscale_levels) if multiscale_levels else None
+    return f"# texture_size={texture_size}\tmultiscale_levels={levels}\tsimilarity_threshold={similarity_threshold}\trejection_margin={rejection_margin}"
+
+def load_similarity_results(results_path):
+    """
+    Loads all finished pairs from an append-only results file.
+
+    First line: settings header (see get_similarity_settings)
+    Every other line: category<TAB>name_1<TAB>name_2<TAB>score
+
+    Returns a dict: (category, name_1, name_2) -> score and the settings header (None if there is none)
+    """
+    results = {}
+    settings = None
+    if not os.path.exists(results_path):
+        return results, settings
+
+    with open(results_path, "r") as results_file:
+        for line in results_file:
+            if line.startswith("#"):
+                settings = line.rstrip("\n")
+                continue
+            values = line.rstrip("\n").split("\t")
+            # an interrupted write can leave a broken last line
+            if len(values) != 4:
+                continue
+            try:
+                results[tuple(values[:3])] = float(values[3])
+            except ValueError:
+                continue
+    return results, settings
+
+def compare_materials_parallel(material_folder, compare_folder, similarity_threshold=0.9, results_path="./saves/material_similarity_results.tsv",
+                               n_jobs=-1, block_size=256, texture_size=512, cache_dir=None, copy_similar=True, 
+                               multiscale_levels=None, rejection_margin=0.1, max_cache_bytes=8*1024**3, 
+                               max_downsampled_cache_bytes=1024**3):
+    """
+    Parallel version of compare_materials_and_copy.
+
+    The pairs get split into blocks of block_size pairs and distributed across a process pool.
+    Every finished pair gets appended to the results file, so an interrupted run resumes
+    automatically by starting again with the same results_path (no start_index needed).
+    The results file starts with the settings (texture_size, multiscale_levels, similarity_threshold, rejection_margin),
+    resuming with other settings raises a ValueError -> use another results_path or delete the file.
+
+    max_cache_bytes, max_downsampled_cache_bytes -> total budget of the texture caches, split across the workers
+
+    At the end the similarity matrix of every category gets saved as
+    'similarity_matrix_<category>.npz' (with 'names' and 'matrix') in the compare folder.
+
+    With multiscale_levels, rejected pairs store the score of the level where they got rejected.
+
+    Returns a dict: category -> (material names, similarity matrix)
+    """
+    os.makedirs(compare_folder, exist_ok=True)
+    if os.path.dirname(results_path):
+        os.makedirs(os.path.dirname(results_path), exist_ok=True)
+
+    settings = get_similarity_settings(texture_size, multiscale_levels, similarity_threshold, rejection_margin)
+    finished, finished_settings = load_similarity_results(results_path)
+    if len(finished) > 0 and finished_settings != settings:
+        raise ValueError(f"{results_path} was computed with other settings:\n    -> File: {finished_settings}\n    -> Now: {settings}\n" +
+                         "Use another results_path or delete the file.")
+    print(f"Found {len(finished)} already compared pairs in {results_path}")
+
+    # every worker has its own texture cache
+    n_workers = max(effective_n_jobs(n_jobs), 1)
+    worker_max_bytes = max_cache_bytes // n_workers
+    worker_max_downsampled_bytes = max_downsampled_cache_bytes // n_workers
+
+    all_materials = {}
+    open_pairs = []
+    for cur_category in sorted(os.listdir(material_folder)):
+        cur_category_path = os.path.join(material_folder, cur_category)
+        if not os.path.isdir(cur_category_path):
+            continue
+
+        materials = find_category_materials(cur_category_path)
+        all_materials[cur_category] = materials
+        material_names = sorted(materials.keys())
+
+        for i in range(len(material_names)):
+            for j in range(i + 1, len(material_names)):
+                if (cur_category, material_names[i], material_names[j]) not in finished:
+                    open_pairs += [(cur_category, material_names[i], materials[material_names[i]][0], 
+                                    material_names[j], materials[material_names[j]][0])]
+
+    pair_blocks = [open_pairs[idx:idx+block_size] for idx in range(0, len(open_pairs), block_size)]
+    print(f"Compare {len(open_pairs)} pairs in {len(pair_blocks)} blocks...")
+
+    # append results as soon as a block is finished
+    done = 0
+    level_counter = dict()
+    # no finished pairs -> new file with the settings header
+    with open(results_path, "a" if len(finished) > 0 else "w") as results_file:
+        if len(finished) == 0:
+            results_file.write(f"{settings}\n")
+        for block_results in Parallel(n_jobs=n_jobs, return_as="generator_unordered")(
+                    delayed(compare_pair_block)(cur_block, texture_size, cache_dir, 
+                                                similarity_threshold, multiscale_levels, rejection_margin,
+                                                worker_max_bytes, worker_max_downsampled_bytes)
+                    for cur_block in pair_blocks
+                ):
+            for category, name_1, name_2, score, level in block_results:
+                level_counter[level] = level_counter.get(level, 0) + 1
+                results_file.write(f"{category}\t{name_1}\t{name_2}\t{score}\n")
+                finished[(category, name_1, name_2)] = score
+            results_file.flush()
+            os.fsync(results_file.fileno())
+
+            done += len(block_results)
+            print(f"Compared {done}/{len(open_pairs)} pairs")
+    print_level_report(level_counter)
+
+    # build similarity matrices and copy similar materials
+    similarity_matrices = {}
+    for cur_category, materials in all_materials.items():
+        material_names = sorted(materials.keys())
+        matrix = np.eye(len(material_names))
+        for i in range(len(material_names)):
+            for j in range(i + 1, len(material_names)):
+                score = finished[(cur_category, material_names[i], material_names[j])]
+                matrix[i, j] = score
+                matrix[j, i] = score
+
+                if copy_similar and score > similarity_threshold:
+                    copy_similar_materials(compare_folder, material_names[i], materials[material_names[i]][1], 
+                                           material_names[j], materials[material_names[j]][1])
+                    print(f"Material {material_names[i]} and Material {material_names[j]} are similar with a similarity score of {score:.2f}")
+
+        np.savez(os.path.join(compare_folder, f"similarity_matrix_{cur_category}.npz"), 
+                 names=np.array(material_names), matrix=matrix)
+        similarity_matrices[cur_category] = (material_names, matrix)
+
+    return similarity_matrices
+
 if __name__ == "__main__":
     material_folder = "D:/Informatik/Projekte/3xM/model_material/brian_500_prep_ue" # "/home/tobia/data/3xM/final/materials"  # Path to your materials folder
     compare_folder = "D:/Informatik/Projekte/3xM/model_material/brian_500_compare" # "/home/tobia/data/3xM/materials/compare"  # Path to the comparison folder
     similarity_threshold = 0.8  # Similarity threshold
 
-    compare_materials_and_copy(material_folder, compare_folder, similarity_threshold, start_index=14561, clear=False)
+    # texture_size=None -> same scores as without cache, only faster
+    texture_cache = TextureCache(max_bytes=2*1024**3, texture_size=None, cache_dir="./saves/texture_cache")
+
+    compare_materials_and_copy(material_folder, compare_folder, similarity_threshold, start_index=14561, clear=False,
+                               texture_cache=texture_cache)
+
+    # compare_materials_parallel(material_folder, compare_folder, similarity_threshold, 
+    #                            results_path="./saves/material_similarity_results.tsv", 
+    #                            n_jobs=-1, texture_size=512, cache_dir="./saves/texture_cache", max_cache_bytes=8*1024**3,
+    #                            multiscale_levels=(32, 128), rejection_margin=0.1)
 
 
 
@@ -1,26 +1,61 @@
+import os
+import time
 import trimesh
 import numpy as np
-from scipy.spatial import distance
+from scipy.spatial import cKDTree
+from joblib import Parallel, delayed
+
+# weight of every descriptor part, every part is scaled so that its distance between two models is between 0 and 1
+DESCRIPTOR_WEIGHTS = {
+    "extents": 1.0,
+    "volume": 1.0,
+    "d2": 1.0
+}
 
 def load_model(file_path):
     # Load a 3D model (STL file in this case) using trimesh
-    return trimesh.load(file_path)
+    # force="mesh" -> GLB/GLTF scenes get merged into one mesh
+    return trimesh.load(file_path, force="mesh")
+
+def get_point_cloud(mesh, n_samples=None):
+    """
+    Returns the vertices of the mesh or, if n_samples is given, 
+    n_samples points sampled on the surface of the mesh.
+    """
+    if n_samples is None:
+        return np.asarray(mesh.vertices, dtype=np.float64)
+    points, _ = trimesh.sample.sample_surface(mesh, n_samples, seed=42)
+    return np.asarray(points, dtype=np.float64)
+
+def directed_hausdorff_distance(points, tree):
+    # nearest neighbour of every point in the other point cloud -> memory only grows with N+M
+    distances, _ = tree.query(points, k=1)
+    return distances.max()
+
+def calculate_hausdorff_distance(mesh1, mesh2, n_samples=None):
+    """
+    Computes the Hausdorff distance between two meshes with KD-Tree queries.
+
+    n_samples -> None uses all vertices, else a fixed amount of surface points per mesh
+    """
+    # Extract the point clouds from the two models
+    points1 = get_point_cloud(mesh1, n_samples)
+    points2 = get_point_cloud(mesh2, n_samples)
 
-def calculate_hausdorff_distance(mesh1, mesh2):
-    # Extract the vertices (point clouds) from the two models
-    vertices1 = mesh1.vertices
-    vertices2 = mesh2.vertices
-    
     # Compute the Hausdorff distance between the point clouds
-    dist_A_to_B = distance.cdist(vertices1, vertices2, 'euclidean').min(axis=1).max()
-    dist_B_to_A = distance.cdist(vertices2, vertices1, 'euclidean').min(axis=1).max()
+    dist_A_to_B = directed_hausdorff_distance(points1, cKDTree(points2))
+    dist_B_to_A = directed_hausdorff_distance(points2, cKDTree(points1))
     
     return max(dist_A_to_B, dist_B_to_A)
 
-def compare_models(model_paths):
+def compare_models(model_paths, n_samples=None):
     # Load all models (STL in this case)
     models = [load_model(path) for path in model_paths]
     num_models = len(models)
+
+    # build point clouds and KD-Trees only once per model
+    point_clouds = [get_point_cloud(model, n_samples) for model in models]
+    trees = [cKDTree(points) for points in point_clouds]
     
     # Matrix to store pairwise similarity (Hausdorff distances)
     similarity_matrix = np.zeros((num_models, num_models))
@@ -28,21 +63,172 @@ def compare_models(model_paths):
     # Compute similarity (Hausdorff distance) pairwise
     for i in range(num_models):
         for j in range(i + 1, num_models):
-            dist = calculate_hausdorff_distance(models[i], models[j])
+            dist = max(directed_hausdorff_distance(point_clouds[i], trees[j]), 
+                       directed_hausdorff_distance(point_clouds[j], trees[i]))
             similarity_matrix[i, j] = dist
             similarity_matrix[j, i] = dist  # Distance is symmetric
     
     return similarity_matrix
 
-# Example file paths to your STL models
-model_paths = ['model1.stl', 'model2.stl', 'model3.stl']
+def normalize_mesh(mesh):
+    """
+    Moves the mesh to the center and scales the biggest dimension to 1 (like transform_models.scale_to_size).
+    """
+    if len(mesh.vertices) == 0:
+        raise ValueError("Mesh has no vertices")
+    max_extent = max(mesh.bounding_box.extents)
+    if max_extent <= 0:
+        raise ValueError("Mesh has no extent (all vertices at one point)")
+
+    mesh = mesh.copy()
+    mesh.apply_translation(-mesh.bounding_box.centroid)
+    mesh.apply_scale(1.0 / max_extent)
+    return mesh
+
+def compute_d2_histogram(points, n_pairs=4096, n_bins=32, seed=42):
+    """
+    D2 shape distribution: histogram of distances between random point pairs.
+    The mesh should be normalized, so that all distances are between 0 and sqrt(3).
+    """
+    rng = np.random.default_rng(seed)
+    idx_1 = rng.integers(0, len(points), n_pairs)
+    idx_2 = rng.integers(0, len(points), n_pairs)
+    distances = np.linalg.norm(points[idx_1] - points[idx_2], axis=1)
+    histogram, _ = np.histogram(distances, bins=n_bins, range=(0.0, np.sqrt(3)))
+    return histogram / n_pairs
+
+def compute_model_descriptor(model_path, n_samples=2048, n_bins=32):
+    """
+    Loads and normalizes a model and computes a cheap global descriptor:
+    sorted extents, convex hull volume and the D2 shape distribution.
+
+    Every part is scaled to a distance between 0 and 1 and weighted with DESCRIPTOR_WEIGHTS:
+    - extents are between 0 and 1 -> / sqrt(3)
+    - the volume is between 0 and 1 (inside of the unit cube)
+    - the D2 histogram sums to 1 -> / sqrt(2)
+
+    Returns (surface points, descriptor)
+    """
+    mesh = normalize_mesh(load_model(model_path))
+    points = get_point_cloud(mesh, n_samples)
+
+    extents = np.sort(mesh.bounding_box.extents)
+    try:
+        volume = mesh.convex_hull.volume
+    except Exception:
+        volume = 0.0
+    d2_histogram = compute_d2_histogram(points, n_bins=n_bins)
+
+    descriptor = np.concatenate([extents / np.sqrt(3) * DESCRIPTOR_WEIGHTS["extents"],
+                                 [volume * DESCRIPTOR_WEIGHTS["volume"]],
+                                 d2_histogram / np.sqrt(2) * DESCRIPTOR_WEIGHTS["d2"]])
+    return points, descriptor
+
+def describe_model(model_path, n_samples=2048, n_bins=32):
+    """
+    Worker function for compare_models_scalable -> compute_model_descriptor, but a broken model does not stop the run.
+
+    Returns (surface points, descriptor, error) -> error is None or the error message
+    """
+    try:
+        points, descriptor = compute_model_descriptor(model_path, n_samples, n_bins)
+        return points, descriptor, None
+    except Exception as e:
+        return None, None, f"{type(e).__name__}: {e}"
+
+def compare_candidate_block(pair_block, point_clouds):
+    """
+    Worker function for compare_models_scalable.
+
+    Returns a list of (i, j, hausdorff distance)
+    """
+    # one KD-Tree per model of this block
+    trees = dict()
+    for idx in sorted(set([idx for pair in pair_block for idx in pair])):
+        trees[idx] = cKDTree(point_clouds[idx])
+
+    results = []
+    for i, j in pair_block:
+        dist = max(directed_hausdorff_distance(point_clouds[i], trees[j]), 
+                   directed_hausdorff_distance(point_clouds[j], trees[i]))
+        results.append((i, j, dist))
+    return results
+
+def compare_models_scalable(model_paths, output_path, n_samples=2048, descriptor_radius=0.1, n_jobs=-1, block_size=512):
+    """
+    All-pairs shape similarity for thousands of models.
+
+    1. Every model gets normalized and described with cheap global descriptors (in parallel)
+    2. Only pairs with descriptor distance <= descriptor_radius are candidates (KD-Tree over the descriptors)
+    3. The Hausdorff distance on n_samples surface points gets computed only for the candidates (in parallel)
+
+    descriptor_radius -> distance of the weighted descriptors (see compute_model_descriptor)
+
+    Models which can not be loaded or normalized get reported and left out.
+
+    The result is saved as sparse matrix in a .npz file with 'names', 'rows', 'cols', 'distances' and 'failed' (names).
+    Rows and cols are indices of model_paths. Pairs which are not in the file got pruned as not similar.
+
+    Returns (rows, cols, distances)
+    """
+    start_time = time.time()
+
+    # descriptors
+    descriptor_results = Parallel(n_jobs=n_jobs)(
+        delayed(describe_model)(cur_path, n_samples)
+        for cur_path in model_paths
+    )
+    point_clouds = [points for points, _, _ in descriptor_results]
+    valid_idx = [idx for idx, (_, _, error) in enumerate(descriptor_results) if error is None]
+    failed = [(model_paths[idx], error) for idx, (_, _, error) in enumerate(descriptor_results) if error is not None]
+    print(f"Computed {len(valid_idx)} descriptors in {time.time()-start_time:.1f}s")
+    if len(failed) > 0:
+        print(f"Failed models: {len(failed)}")
+        for cur_path, cur_error in failed:
+            print(f"    -> {cur_path}: {cur_error}")
+
+    # prefilter (only the valid models, indices back to model_paths)
+    if len(valid_idx) > 1:
+        descriptors = np.stack([descriptor_results[idx][1] for idx in valid_idx])
+        candidate_pairs = sorted([(valid_idx[i], valid_idx[j]) for i, j in cKDTree(descriptors).query_pairs(r=descriptor_radius)])
+    else:
+        candidate_pairs = []
+    n_all_pairs = len(model_paths)*(len(model_paths)-1)//2
+    print(f"Candidate pairs: {len(candidate_pairs)} of {n_all_pairs}")
+
+    # exact distances
+    pair_blocks = [candidate_pairs[idx:idx+block_size] for idx in range(0, len(candidate_pairs), block_size)]
+    block_results = Parallel(n_jobs=n_jobs)(
+        delayed(compare_candidate_block)(cur_block, {idx: point_clouds[idx] for pair in cur_block for idx in pair})
+        for cur_block in pair_blocks
+    )
+    results = [cur_result for cur_block in block_results for cur_result in cur_block]
+
+    rows = np.array([i for i, _, _ in results], dtype=np.int64)
+    cols = np.array([j for _, j, _ in results], dtype=np.int64)
+    distances = np.array([dist for _, _, dist in results], dtype=np.float64)
+
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    np.savez(output_path, names=np.array(model_paths), rows=rows, cols=cols, distances=distances,
+             failed=np.array([cur_path for cur_path, _ in failed]))
+    print(f"Saved sparse similarity matrix to {output_path} (needed {time.time()-start_time:.1f}s)")
+
+    return rows, cols, distances
+
+if __name__ == "__main__":
+    # Example file paths to your STL models
+    model_paths = ['model1.stl', 'model2.stl', 'model3.stl']
+
+    # Calculate the similarity between all models
+    similarity_matrix = compare_models(model_paths, n_samples=None)
 
-# Calculate the similarity between all models
-similarity_matrix = compare_models(model_paths)
+    # Print the results
+    print("Similarity Matrix (Hausdorff Distance):")
+    print(similarity_matrix)
 
-# Print the results
-print("Similarity Matrix (Hausdorff Distance):")
-print(similarity_matrix)
+    # for many models:
+    # compare_models_scalable(model_paths, output_path="./saves/model_similarity.npz", n_samples=2048, descriptor_radius=0.1)
 
 
 
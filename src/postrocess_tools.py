@@ -10,6 +10,9 @@ from joblib import Parallel, delayed
 from pycocotools import mask
 import json
 
+from image_probe import probe_image, probe_with_decode
+from dataset_formatting import rgb_mask_to_grey_mask, iter_single_scene_dir_samples
+
 
 
 class FORMATS(Enum):
@@ -47,7 +50,54 @@ def mask_postprocess_single_scene_dir(source_path, format=FORMATS.SINGLE_SCENE_D
                     cv2.imwrite(os.path.join(source_path, cur_scene_dir, f"grey_{cur_file}"), grey_mask)
 
 
-def to_dual_dir_and_mask_postprocess(source_path, output_path, with_subfolders=True):
+def is_manifest_valid(manifest_path, source_path, with_subfolders):
+    # an existing manifest of the same source_path and with_subfolders -> indices can be reused
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+    return manifest.get("source_path") == source_path and manifest.get("with_subfolders") == with_subfolders
+
+def create_dual_dir_manifest(source_path, manifest_path, with_subfolders=True, resume=False):
+    """
+    Assigns every scene a fixed output index and saves it as manifest (JSON).
+
+    resume -> keeps the indices of an existing manifest and appends new scenes at the end,
+              a manifest of another source_path or with_subfolders gets rebuilt
+    """
+    samples = []
+    if resume and is_manifest_valid(manifest_path, source_path, with_subfolders):
+        with open(manifest_path, "r") as manifest_file:
+            samples = json.load(manifest_file)["samples"]
+    elif resume and os.path.exists(manifest_path):
+        print(f"Manifest {manifest_path} was created with other settings -> rebuilding it")
+
+    known_scenes = set([cur_sample["scene"] for cur_sample in samples])
+    next_idx = max([cur_sample["index"] for cur_sample in samples], default=-1) + 1
+    # same scene listing as dataset_formatting, the manifest stores the scene relative to source_path and the file names
+    for cur_sample in iter_single_scene_dir_samples(source_path, with_subfolders=with_subfolders):
+        cur_scene = os.path.relpath(os.path.dirname(cur_sample["mask"]), source_path).replace("\\", "/")
+        if cur_scene not in known_scenes:
+            samples += [{"scene": cur_scene, "raw": os.path.basename(cur_sample["rgb"]),
+                         "mask": os.path.basename(cur_sample["mask"]), "index": next_idx}]
+            next_idx += 1
+
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as manifest_file:
+        json.dump({"source_path": source_path, "with_subfolders": with_subfolders, "samples": samples}, manifest_file, indent=4)
+    os.replace(tmp_path, manifest_path)
+    return samples
+
+def link_or_copy(source, target):
+    # hardlink on the same filesystem, else copy
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy(source, target)
+
+def to_dual_dir_and_mask_postprocess(source_path, output_path, with_subfolders=True, resume=False, chunk_size=64, n_jobs=-1):
     """
     Change SINGLE_DCENE_DIR Format to DUAL_DIR format and make mask postprocess.
 
@@ -67,8 +117,17 @@ def to_dual_dir_and_mask_postprocess(source_path, output_path, with_subfolders=T
     masks
     ........mask_1.png
     ...
+    manifest.json
+
+    The manifest maps every scene to its output index (sorted, so the same on every machine).
+    resume -> continues a previous run with the manifest and only converts scenes without output,
+              the output of another source_path or with_subfolders gets removed
     """
-    if os.path.exists(output_path):
+    manifest_path = os.path.join(output_path, "manifest.json")
+    if resume and os.path.exists(manifest_path) and not is_manifest_valid(manifest_path, source_path, with_subfolders):
+        print(f"Output {output_path} was created with other settings -> starting from scratch")
+        resume = False
+    if not (resume and os.path.exists(manifest_path)) and os.path.exists(output_path):
         shutil.rmtree(output_path)
     
     os.makedirs(output_path, exist_ok=True)
@@ -79,47 +138,38 @@ def to_dual_dir_and_mask_postprocess(source_path, output_path, with_subfolders=T
     os.makedirs(mask_path, exist_ok=True)
     os.makedirs(color_path, exist_ok=True)
     
-    # task_list = []
+    samples = create_dual_dir_manifest(source_path, manifest_path, with_subfolders=with_subfolders, resume=resume)
 
-    # idx = 0
-    # for cur_scene_dir in os.listdir(source_path):
-    #     task_list += [lambda: move_scene_files(source_path, cur_scene_dir, mask_path, color_path, idx)]
-    #     idx += 1
-    
-    if with_subfolders:
-        all_scenes = []
-        for cur_dir in os.listdir(source_path):
-            for cur_scene in os.listdir(os.path.join(source_path, cur_dir)):
-                all_scenes += [os.path.join(source_path, cur_dir, cur_scene)]
-    else:
-        all_scenes = []
-        for cur_scene in os.listdir(source_path):
-                all_scenes += [os.path.join(source_path, cur_scene)]
-        
-    # run all tasks as fast as possible
-    Parallel(n_jobs=-1)(
-        delayed(move_scene_files)(cur_scene_dir, mask_path, color_path, idx)
-        for idx, cur_scene_dir in enumerate(all_scenes)
+    # the mask gets written last -> existing mask = finished sample
+    open_samples = [cur_sample for cur_sample in samples 
+                    if not os.path.exists(os.path.join(mask_path, f"image_{cur_sample['index']:08}.png"))]
+    print(f"Converting {len(open_samples)}/{len(samples)} scenes.")
+
+    chunks = [open_samples[idx:idx+chunk_size] for idx in range(0, len(open_samples), chunk_size)]
+    Parallel(n_jobs=n_jobs)(
+        delayed(move_scene_chunk)(source_path, cur_chunk, mask_path, color_path)
+        for cur_chunk in chunks
     )
 
+def move_scene_chunk(source_path, samples, mask_path, color_path):
+    for cur_sample in samples:
+        cur_scene_dir = os.path.join(source_path, cur_sample["scene"])
+        move_scene_files(os.path.join(cur_scene_dir, cur_sample["raw"]), os.path.join(cur_scene_dir, cur_sample["mask"]),
+                         mask_path, color_path, cur_sample["index"])
 
-def move_scene_files(cur_scene_dir, mask_path, color_path, idx):
-    grey_mask = None
-    rgb_img = None
-    for cur_file in os.listdir(cur_scene_dir):
-        if cur_file.startswith("mask"):
-            mask_rgb_img = cv2.imread(os.path.join(cur_scene_dir, cur_file))
-            if mask_rgb_img is not None:
-                grey_mask = rgb_mask_to_grey_mask(mask_rgb_img)
-                
-        elif cur_file.startswith("raw"):
-            # rgb_img = cv2.imread(os.path.join(cur_scene_dir, cur_file))
-            rgb_img = os.path.join(cur_scene_dir, cur_file)
+def move_scene_files(rgb_img, mask_img, mask_path, color_path, idx):
+    mask_rgb_img = cv2.imread(mask_img, cv2.IMREAD_UNCHANGED)
+    if mask_rgb_img is None:
+        return False
+    grey_mask = rgb_mask_to_grey_mask(mask_rgb_img)
+
+    link_or_copy(rgb_img, os.path.join(color_path, f"image_{idx:08}.png"))
 
-    if rgb_img is not None and grey_mask is not None:
-        cv2.imwrite(os.path.join(mask_path, f"image_{idx:08}.png"), grey_mask)
-        # cv2.imwrite(os.path.join(color_path, f"image_{idx:08}.png"), rgb_img)
-        shutil.copy(rgb_img, os.path.join(color_path, f"image_{idx:08}.png"))
+    # write and rename -> a mask only exists if it is complete
+    tmp_path = os.path.join(mask_path, f"image_{idx:08}.tmp.png")
+    cv2.imwrite(tmp_path, grey_mask)
+    os.replace(tmp_path, os.path.join(mask_path, f"image_{idx:08}.png"))
+    return True
 
 def depth_postprocess(depth_source_path, depth_output_path):
     if os.path.exists(depth_output_path):
@@ -177,8 +227,14 @@ def coco_postprocess(rgb_folder, mask_folder, output_json):
             # Add image entry
             image_path = os.path.join(rgb_folder, file_name)
             mask_path = os.path.join(mask_folder, file_name)
-            image = cv2.imread(image_path)
-            height, width, _ = image.shape
+            # only read the image header, unknown or broken headers -> decode with OpenCV
+            probe_info = probe_image(image_path)
+            if probe_info is None:
+                probe_info = probe_with_decode(image_path)
+            if probe_info is None:
+                print(f"Could not read image {image_path} -> skipped")
+                continue
+            height, width = probe_info["height"], probe_info["width"]
 
             image_info = {
                 "id": idx + 1,
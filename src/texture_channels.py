@@ -0,0 +1,163 @@
+"""
+Packing and unpacking of ORM/ARM textures.
+
+Channel layout (like glTF):
+- R -> Ambient Occlusion
+- G -> Roughness
+- B -> Metalness
+
+OpenCV works with BGR, so the channel index in the image arrays is 2 for AO, 1 for roughness and 0 for metalness.
+"""
+
+import os
+import time
+
+import numpy as np
+import cv2
+
+from joblib import Parallel, delayed
+
+# BGR channel index of every map in a packed texture
+CHANNEL_INDEX = {
+    "ao": 2,
+    "roughness": 1,
+    "metal": 0
+}
+
+# value of a missing map -> no occlusion, middle roughness (like the Unreal default), not metallic
+CHANNEL_DEFAULTS = {
+    "ao": 255,
+    "roughness": 128,
+    "metal": 0
+}
+
+# standardized names of the prepared materials (see transform_materials.get_standardized_material_name)
+CHANNEL_FILE_NAMES = {
+    "ao": "ambient_occlusion.jpg",
+    "roughness": "roughness.jpg",
+    "metal": "metal.jpg"
+}
+
+def img_is_none(img):
+    return img is None or not isinstance(img, np.ndarray) or img.size == 0
+
+def pack_channels(output_path, ao_path=None, roughness_path=None, metal_path=None, defaults=None):
+    """
+    Packs up to 3 grayscale maps into one texture (missing maps get the value of CHANNEL_DEFAULTS).
+
+    defaults -> other values for the missing maps, for example all 0 like the old MetalRoughness textures
+
+    Every map gets decoded only once and directly as grayscale. If the sizes differ,
+    the bigger maps get resized to the smallest map. The output buffer is allocated once.
+
+    Returns True if the packed texture got written.
+    """
+    channels = dict()
+    for cur_channel, cur_path in [("ao", ao_path), ("roughness", roughness_path), ("metal", metal_path)]:
+        if not cur_path:
+            continue
+        cur_img = cv2.imread(cur_path, cv2.IMREAD_GRAYSCALE)
+        if img_is_none(cur_img):
+            print(f"Could not load {cur_channel} texture from {cur_path}")
+            continue
+        channels[cur_channel] = cur_img
+
+    if len(channels) == 0:
+        print(f"Could not load any texture for {output_path}.")
+        return False
+
+    # smallest size
+    height, width = min([cur_img.shape[:2] for cur_img in channels.values()], key=lambda x: x[0]+x[1])
+
+    if defaults is None:
+        defaults = CHANNEL_DEFAULTS
+    packed_img = np.empty((height, width, 3), dtype=np.uint8)
+    for cur_channel, cur_value in defaults.items():
+        packed_img[:, :, CHANNEL_INDEX[cur_channel]] = cur_value
+    for cur_channel, cur_img in channels.items():
+        if cur_img.shape[:2] != (height, width):
+            print(f"Resizing {cur_channel} image from {cur_img.shape} to {(height, width)}")
+            cur_img = cv2.resize(cur_img, (width, height), interpolation=cv2.INTER_AREA)
+        packed_img[:, :, CHANNEL_INDEX[cur_channel]] = cur_img
+
+    cv2.imwrite(output_path, packed_img)
+    return True
+
+def unpack_channels(packed_path, ao_path=None, roughness_path=None, metal_path=None):
+    """
+    Unpacks a ORM/ARM texture into single grayscale maps. Only the given output paths get written.
+
+    The texture gets decoded once, the channels are written without splitting the whole image.
+
+    Returns True if the texture could be loaded.
+    """
+    packed_img = cv2.imread(packed_path, cv2.IMREAD_COLOR)
+    if img_is_none(packed_img):
+        print(f"Error: Could not load image {packed_path}")
+        return False
+
+    for cur_channel, cur_path in [("ao", ao_path), ("roughness", roughness_path), ("metal", metal_path)]:
+        if cur_path:
+            cv2.imwrite(cur_path, np.ascontiguousarray(packed_img[:, :, CHANNEL_INDEX[cur_channel]]))
+    return True
+
+def pack_material(material_path, output_name="ORM.png", remove_sources=False):
+    """
+    Packs the standardized AO, roughness and metal maps of one prepared material.
+
+    remove_sources -> removes the single maps after packing (less texture files to import)
+    """
+    paths = dict()
+    for cur_channel, cur_name in CHANNEL_FILE_NAMES.items():
+        cur_path = os.path.join(material_path, cur_name)
+        paths[cur_channel] = cur_path if os.path.exists(cur_path) else None
+
+    if all([cur_path is None for cur_path in paths.values()]):
+        return False
+
+    success = pack_channels(os.path.join(material_path, output_name),
+                            ao_path=paths["ao"], roughness_path=paths["roughness"], metal_path=paths["metal"])
+
+    if success and remove_sources:
+        for cur_path in paths.values():
+            if cur_path:
+                os.remove(cur_path)
+    return success
+
+def pack_library(source_path, output_name="ORM.png", remove_sources=False, with_subfolders=False, n_jobs=-1):
+    """
+    Packs the AO, roughness and metal maps of every material in a prepared material library in parallel.
+
+    with_subfolders = False:
+    source_path/material/...
+
+    with_subfolders = True:
+    source_path/category/material/...
+    """
+    start_time = time.time()
+
+    material_paths = []
+    if with_subfolders:
+        for cur_category in sorted(os.listdir(source_path)):
+            cur_category_path = os.path.join(source_path, cur_category)
+            if os.path.isdir(cur_category_path):
+                for cur_material in sorted(os.listdir(cur_category_path)):
+                    if os.path.isdir(os.path.join(cur_category_path, cur_material)):
+                        material_paths += [os.path.join(cur_category_path, cur_material)]
+    else:
+        for cur_material in sorted(os.listdir(source_path)):
+            if os.path.isdir(os.path.join(source_path, cur_material)):
+                material_paths += [os.path.join(source_path, cur_material)]
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(pack_material)(cur_path, output_name, remove_sources)
+        for cur_path in material_paths
+    )
+
+    print(f"Packed {sum(results)}/{len(material_paths)} materials in {time.time()-start_time:.1f}s.")
+
+
+
+if __name__ == "__main__":
+    pack_library(source_path="D:/Informatik/Projekte/3xM/final_materials", output_name="ORM.png", remove_sources=False)
+
@@ -1,14 +1,21 @@
 import os
+import re
 import shutil
 import random
+import time
+from functools import lru_cache
 
 from PIL import Image
-import bpy
 import json
 
 import numpy as np
 import cv2
 
+from joblib import Parallel, delayed
+
+from texture_channels import pack_channels, unpack_channels
+from image_probe import probe_image
+
 MATERIAL_PATH = "/home/tobia/data/model_material_mixture_dataset/materials/"
 
 MATERIAL_BLENDER_PATH = os.path.join(MATERIAL_PATH, "raw")
@@ -25,8 +32,30 @@ MATERIAL_NAME_MAP = {
     "opacity_map": ["opacity"]
 }
 
+# max texture resolution per map type for the texture downscaling in the material prep
+MAX_TEXTURE_RESOLUTION = {
+    "color_map": 2048,
+    "height_map": 1024,
+    "normal_map": 2048,
+    "roughness_map": 1024,
+    "metal_map": 1024,
+    "bump_map": 1024,
+    "ao_map": 1024,
+    "opacity_map": 1024
+}
+
+# one precompiled matcher for all material attributes -> one named group per attribute, one pass over the file name
+# the lookahead matches at every position, so overlapping keywords of different attributes are all found
+MATERIAL_NAME_PATTERN = re.compile("(?=" + "|".join([f"(?P<{cur_attribute}>" + "|".join([re.escape(i) for i in keys]) + ")" 
+                                                     for cur_attribute, keys in MATERIAL_NAME_MAP.items()]) + ")")
+
+# in-memory cache of the material indices -> (abs source path, extract_arm_file) -> index
+MATERIAL_INDEX_CACHE = dict()
+
 
 def create_material(PATH, OUTPUT_PATH):
+    import bpy
+
     material_name = PATH.split("/")[-1] + ".gltf"
     category = PATH.split("/")[-2]
     OUTPUT_PATH = os.path.join(OUTPUT_PATH, category)
@@ -204,73 +233,370 @@ def find_material(PATH, should_count_all=False, extract_arm_file=False):
     - **Description**: Controls the transparency of a surface. White areas are fully opaque, while black areas are fully transparent, with grayscale values representing varying degrees of transparency.
     - **Common uses**: Creating transparent materials like glass, leaves, or cloth with holes.
     """
-    material = {
-        "color_map": None,
-        "height_map": None,
-        "normal_map": None,
-        "roughness_map": None,
-        "metal_map": None,
-        "bump_map": None,
-        "ao_map": None,
-        "opacity_map": None,
-    }
+    material, material_count, _ = scan_material(PATH, should_count_all=should_count_all, extract_arm_file=extract_arm_file)
 
-    material_count = {
-        "color_map": 0,
-        "height_map": 0,
-        "normal_map": 0,
-        "roughness_map": 0,
-        "metal_map": 0,
-        "bump_map": 0,
-        "ao_map": 0,
-        "opacity_map": 0,
-    }
+    if should_count_all:
+        return material, material_count
+    else:
+        return material
+
+@lru_cache(maxsize=None)
+def classify_texture_file(file_name:str):
+    """
+    Returns all material attributes (in the order of MATERIAL_NAME_MAP), which keywords are in the file name.
+    """
+    found_attributes = set([match.lastgroup for match in MATERIAL_NAME_PATTERN.finditer(file_name.lower())])
+    return tuple([cur_attribute for cur_attribute in MATERIAL_NAME_MAP.keys() if cur_attribute in found_attributes])
+
+def walk_files(PATH):
+    """
+    Faster os.walk with os.scandir. Yields (root_path, file names) in the same order as os.walk.
+    """
+    files = []
+    dirs = []
+    try:
+        with os.scandir(PATH) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    # like os.walk -> don't follow linked folders
+                    if not entry.is_symlink():
+                        dirs += [entry.path]
+                else:
+                    files += [entry.name]
+    except OSError:
+        return
+
+    yield PATH, files
+    for cur_dir in dirs:
+        yield from walk_files(cur_dir)
+
+def scan_material(PATH, should_count_all=False, extract_arm_file=False):
+    """
+    Walks one material folder once and classifies every file.
 
-    if extract_arm_file:
-        already_extracted_arm = False
-        for root_path, cur_dirs, cur_files in os.walk(PATH):
+    Returns (material, material_count, file_types):
+    - material -> attribute: path (same like find_material)
+    - material_count -> attribute: amount of matching files (always counted)
+    - file_types -> file ending: amount of files
+    """
+    material = {cur_attribute: None for cur_attribute in MATERIAL_NAME_MAP.keys()}
+    material_count = {cur_attribute: 0 for cur_attribute in MATERIAL_NAME_MAP.keys()}
+    file_types = dict()
+
+    already_extracted_arm = not extract_arm_file
+    for root_path, cur_files in walk_files(PATH):
+        # extract the first arm file -> the new files get added to the end of the current folder
+        if not already_extracted_arm:
             for cur_file in cur_files:
-                cur_file_path = os.path.join(root_path, cur_file)
-                if "arm" in cur_file.lower() and os.path.isfile(cur_file_path):
-                    extract_arm_channels(cur_file_path, 
+                if "arm" in cur_file.lower():
+                    extract_arm_channels(os.path.join(root_path, cur_file), 
                                          os.path.join(root_path, get_standardized_material_name("ao")),
                                          os.path.join(root_path, get_standardized_material_name("roughness")),
                                          os.path.join(root_path, get_standardized_material_name("metal")))
                     already_extracted_arm = True
+                    new_files = [get_standardized_material_name(i) for i in ["ao", "roughness", "metal"]]
+                    cur_files = [i for i in cur_files if i not in new_files] + new_files
                     break
-            if already_extracted_arm:
-                break
 
-    for root_path, cur_dirs, cur_files in os.walk(PATH):
         for cur_file in cur_files:
-            for cur_attribute, keys in MATERIAL_NAME_MAP.items():
-                if any([i in cur_file.lower() for i in keys]):
+            file_type = cur_file.split(".")[-1]
+            file_types[file_type] = file_types.get(file_type, 0) + 1
+
+            cur_attributes = classify_texture_file(cur_file)
+            for cur_attribute in cur_attributes:
+                material_count[cur_attribute] += 1
+
+            if should_count_all:
+                for cur_attribute in cur_attributes:
                     material[cur_attribute] = os.path.join(root_path, cur_file)
-                    if not should_count_all:
-                        break
-                    else:
-                        material_count[cur_attribute] += 1
+            elif len(cur_attributes) > 0:
+                material[cur_attributes[0]] = os.path.join(root_path, cur_file)
 
-    if should_count_all:
-        return material, material_count
+    return material, material_count, file_types
+
+def build_material_index(source_path, extract_arm_file=False):
+    """
+    Walks the whole material library (source_path/category/material) once.
+
+    The materials are sorted by (category, name).
+
+    Returns a json serializable index:
+    {
+        "source_path": ...,
+        "extract_arm_file": ...,
+        "source_mtimes": {relative folder: mtime} (see get_source_mtimes),
+        "materials": [
+            {"category": ..., "name": ..., "path": ..., "maps": {attribute: path}, "counts": {attribute: amount}, "file_types": {ending: amount}},
+            ...
+        ]
+    }
+    """
+    materials = []
+    # sorted by (category, name) -> same order (and material IDs) on every machine
+    for cur_category, cur_name, cur_path in list_material_dirs(source_path):
+        material, material_count, file_types = scan_material(cur_path, extract_arm_file=extract_arm_file)
+        materials += [{
+            "category": cur_category,
+            "name": cur_name,
+            "path": cur_path,
+            "maps": material,
+            "counts": material_count,
+            "file_types": file_types
+        }]
+
+    return {
+        "source_path": source_path,
+        "extract_arm_file": extract_arm_file,
+        # after the scan, because the arm extraction can add files
+        "source_mtimes": get_source_mtimes(source_path),
+        "materials": materials
+    }
+
+def get_source_mtimes(source_path):
+    """
+    Returns the modification times of the library, category and material folders -> {relative folder: mtime}
+
+    Added, removed or renamed materials and files directly in a material folder change one of them.
+    Changes in subfolders of a material or overwritten files are not detected -> use refresh.
+    """
+    source_mtimes = {".": os.stat(source_path).st_mtime}
+    for cur_category, cur_name, cur_path in list_material_dirs(source_path):
+        source_mtimes.setdefault(cur_category, os.stat(os.path.dirname(cur_path)).st_mtime)
+        source_mtimes[f"{cur_category}/{cur_name}"] = os.stat(cur_path).st_mtime
+    return source_mtimes
+
+def is_material_index_valid(material_index, source_path, extract_arm_file=False):
+    """
+    Checks, if a saved material index got built for the same library with the same ARM setting
+    and the library did not change since then (see get_source_mtimes).
+    """
+    if os.path.abspath(material_index.get("source_path", "")) != os.path.abspath(source_path):
+        return False
+    if material_index.get("extract_arm_file") != extract_arm_file:
+        return False
+    try:
+        return material_index.get("source_mtimes") == get_source_mtimes(source_path)
+    except OSError:
+        return False
+
+def get_material_index(source_path, extract_arm_file=False, index_path=None, refresh=False, catalog_path=None):
+    """
+    Returns the material index of the library (see build_material_index).
+
+    The index gets cached in memory, so all entry points reuse it. 
+    With index_path the index also gets saved as json file and loaded from there in the next run,
+    if it got built with the same extract_arm_file and the library did not change (see is_material_index_valid).
+    With catalog_path the persistent material catalog gets used and incremental updated (see update_material_catalog).
+    """
+    cache_key = (os.path.abspath(source_path), extract_arm_file)
+    if not refresh and cache_key in MATERIAL_INDEX_CACHE:
+        return MATERIAL_INDEX_CACHE[cache_key]
+
+    if catalog_path:
+        material_index = {
+            "source_path": source_path,
+            "extract_arm_file": extract_arm_file,
+            "materials": update_material_catalog(source_path, catalog_path, extract_arm_file=extract_arm_file, 
+                                                 full_rescan=refresh)
+        }
     else:
-        return material
-    
-def extract_arm_channels(arm_image_path, output_ao_path, output_roughness_path, output_metalness_path):
-    # Load the ARM image (RGB image where AO is in R, Roughness in G, Metalness in B)
-    arm_image = cv2.imread(arm_image_path)
+        material_index = None
+        if not refresh and index_path and os.path.exists(index_path):
+            with open(index_path, "r") as index_file:
+                material_index = json.load(index_file)
+            if not is_material_index_valid(material_index, source_path, extract_arm_file=extract_arm_file):
+                print(f"Material index {index_path} is outdated -> rebuild")
+                material_index = None
+
+        if material_index is None:
+            material_index = build_material_index(source_path, extract_arm_file=extract_arm_file)
+            if index_path:
+                with open(index_path, "w") as index_file:
+                    json.dump(material_index, index_file, indent=4)
+
+    MATERIAL_INDEX_CACHE[cache_key] = material_index
+    return material_index
+
+def get_image_resolution(image_path):
+    """
+    Returns [width, height] of an image (only the header gets read, see image_probe) or None.
+    """
+    info = probe_image(image_path)
+    if info is None:
+        return None
+    return [info["width"], info["height"]]
 
-    if arm_image is None:
-        print(f"Error: Could not load image {arm_image_path}")
-        return
+def create_catalog_entry(category, name, material_path, extract_arm_file=False):
+    """
+    Scans one material and creates an entry for the material catalog.
+    """
+    material, material_count, file_types = scan_material(material_path, extract_arm_file=extract_arm_file)
 
-    # Split the ARM image into its Red, Green, and Blue channels
-    ao_image, roughness_image, metalness_image = cv2.split(arm_image)
+    textures = dict()
+    for cur_attribute, cur_path in material.items():
+        if cur_path:
+            cur_stat = os.stat(cur_path)
+            textures[cur_attribute] = {
+                "path": cur_path,
+                "size": cur_stat.st_size,
+                "mtime": cur_stat.st_mtime,
+                "resolution": get_image_resolution(cur_path)
+            }
 
-    # Save the individual channel images
-    cv2.imwrite(output_ao_path, ao_image)  # AO (Red channel)
-    cv2.imwrite(output_roughness_path, roughness_image)  # Roughness (Green channel)
-    cv2.imwrite(output_metalness_path, metalness_image)  # Metalness (Blue channel)
+    material_data_path = os.path.join(material_path, "material_data.json")
+
+    # after the scan, because the arm extraction can add files
+    # every (sub)folder -> new files in subfolders change only the mtime of the subfolder
+    dir_mtimes = {".": os.stat(material_path).st_mtime}
+    for root_path, _ in walk_files(material_path):
+        dir_mtimes[os.path.relpath(root_path, material_path)] = os.stat(root_path).st_mtime
+
+    return {
+        "category": category,
+        "name": name,
+        "path": material_path,
+        "extract_arm_file": extract_arm_file,
+        "mtime": dir_mtimes["."],
+        "dir_mtimes": dir_mtimes,
+        "maps": material,
+        "counts": material_count,
+        "file_types": file_types,
+        "textures": textures,
+        "material_data": material_data_path if os.path.exists(material_data_path) else None
+    }
+
+def is_catalog_entry_valid(entry, extract_arm_file=False):
+    """
+    Checks with some stat calls (no listing), if the material changed since the entry got created.
+
+    An entry scanned without ARM extraction is not valid, if the extraction is wanted now.
+    """
+    if extract_arm_file and not entry.get("extract_arm_file", False):
+        return False
+    try:
+        for cur_dir, cur_mtime in entry.get("dir_mtimes", {".": entry["mtime"]}).items():
+            if os.stat(os.path.join(entry["path"], cur_dir)).st_mtime != cur_mtime:
+                return False
+        for cur_texture in entry["textures"].values():
+            if os.stat(cur_texture["path"]).st_mtime != cur_texture["mtime"]:
+                return False
+    except OSError:
+        return False
+    return True
+
+def load_material_catalog(catalog_path):
+    """
+    Loads the material catalog (json-lines file) -> first line is the header with the category mtimes.
+
+    Returns (header, entries)
+    """
+    header = {"source_path": None, "categories": dict()}
+    entries = []
+    if not os.path.exists(catalog_path):
+        return header, entries
+
+    with open(catalog_path, "r") as catalog_file:
+        for line_idx, line in enumerate(catalog_file):
+            if line.strip() == "":
+                continue
+            if line_idx == 0:
+                header = json.loads(line)
+            else:
+                entries += [json.loads(line)]
+    return header, entries
+
+def save_material_catalog(catalog_path, header, entries):
+    if os.path.dirname(catalog_path):
+        os.makedirs(os.path.dirname(catalog_path), exist_ok=True)
+
+    # write to a temporary file first -> an interrupted write can't break the catalog
+    tmp_catalog_path = f"{catalog_path}.tmp"
+    with open(tmp_catalog_path, "w") as catalog_file:
+        catalog_file.write(json.dumps(header) + "\n")
+        for cur_entry in entries:
+            catalog_file.write(json.dumps(cur_entry) + "\n")
+    os.replace(tmp_catalog_path, catalog_path)
+
+def update_material_catalog(source_path, catalog_path, extract_arm_file=False, full_rescan=False):
+    """
+    Persistent material catalog (json-lines) with the category, textures, resolutions, file sizes and mtimes of every material.
+
+    Only changed parts get rescanned:
+    - a category gets listed again, only if the mtime of the category folder changed (new or removed materials)
+    - a material gets scanned again, only if the mtime of one of its (sub)folders or textures changed
+      or if extract_arm_file is True and the entry got scanned without ARM extraction
+
+    The ARM flag is stored per entry, so callers with and without ARM extraction can share one catalog.
+
+    Returns the list of catalog entries (can be used like the materials of the material index).
+    """
+    header, old_entries = load_material_catalog(catalog_path)
+    if full_rescan or header["source_path"] != os.path.abspath(source_path):
+        header = {"source_path": os.path.abspath(source_path), "categories": dict()}
+        old_entries = []
+
+    old_entries_per_category = dict()
+    for cur_entry in old_entries:
+        old_entries_per_category.setdefault(cur_entry["category"], []).append(cur_entry)
+
+    entries = []
+    categories = dict()
+    rescanned = 0
+    with os.scandir(source_path) as cur_categories:
+        for cur_category in cur_categories:
+            if not cur_category.is_dir():
+                continue
+            category_mtime = cur_category.stat().st_mtime
+            categories[cur_category.name] = category_mtime
+
+            cur_old_entries = {cur_entry["name"]: cur_entry for cur_entry in old_entries_per_category.get(cur_category.name, [])}
+            if header["categories"].get(cur_category.name) == category_mtime:
+                # same materials as before
+                material_names = list(cur_old_entries.keys())
+            else:
+                with os.scandir(cur_category.path) as cur_materials:
+                    material_names = [cur_material.name for cur_material in cur_materials if cur_material.is_dir()]
+
+            for cur_name in material_names:
+                cur_entry = cur_old_entries.get(cur_name)
+                if cur_entry is None or not is_catalog_entry_valid(cur_entry, extract_arm_file=extract_arm_file):
+                    cur_entry = create_catalog_entry(cur_category.name, cur_name, os.path.join(cur_category.path, cur_name), 
+                                                     extract_arm_file=extract_arm_file)
+                    rescanned += 1
+                entries += [cur_entry]
+
+    # sorted by (category, name) -> same order (and material IDs) on every machine
+    entries = sorted(entries, key=lambda x: (x["category"], x["name"]))
+
+    header["categories"] = categories
+    save_material_catalog(catalog_path, header, entries)
+    print(f"Material catalog: {len(entries)} materials, {rescanned} (re)scanned.")
+    return entries
+
+def filter_materials(entries, categories=None, required_maps=None, min_resolution=None):
+    """
+    Filters catalog entries.
+
+    categories -> list of allowed categories
+    required_maps -> list of attributes, which the material needs (for example ["color_map", "normal_map"])
+    min_resolution -> minimum width and height of the color map
+    """
+    result = []
+    for cur_entry in entries:
+        if categories and cur_entry["category"] not in categories:
+            continue
+        if required_maps and any([cur_entry["maps"].get(i) is None for i in required_maps]):
+            continue
+        if min_resolution:
+            resolution = cur_entry["textures"].get("color_map", {}).get("resolution")
+            if resolution is None or min(resolution) < min_resolution:
+                continue
+        result += [cur_entry]
+    return result
+
+def extract_arm_channels(arm_image_path, output_ao_path, output_roughness_path, output_metalness_path):
+    # ARM image (RGB image where AO is in R, Roughness in G, Metalness in B) -> see texture_channels
+    unpack_channels(arm_image_path, ao_path=output_ao_path, roughness_path=output_roughness_path, metal_path=output_metalness_path)
     
 def get_standardized_material_name(material_name:str):
 
@@ -368,45 +694,31 @@ def read_key(key_str, should_print=False):
 
     return res
 
-def find_materials(PATH):
+def find_materials(PATH, material_index=None, catalog_path=None):
     # materials
+    if material_index is None:
+        material_index = get_material_index(PATH, catalog_path=catalog_path)
+
     n_materials = 0
     n_material_pattern = dict()
-    for category in os.listdir(PATH):
-        for material in os.listdir(os.path.join(PATH, category)):
-            if os.path.isdir(os.path.join(PATH, category, material)):
-                n_materials += 1
-
-                file_counter = 0
-                blend_files = 0
-                gltf_files = 0
-                bin_files = 0
-                images = 0
-                for cur_path, cur_dirs, cur_files in os.walk(os.path.join(PATH, category, material)):
-                    for cur_file in cur_files:
-                        file_counter += 1
-                        if cur_file.endswith(".blend"):
-                            blend_files += 1
-                        elif cur_file.endswith(".gltf"):
-                            gltf_files += 1
-                        elif cur_file.endswith(".bin"):
-                            bin_files += 1
-                        elif cur_file.endswith(".png") or cur_file.endswith(".jpg"):
-                            images += 1
-
-                material, n_material = find_material(cur_path, should_count_all=True)
-
-                key = create_key(file_counter=file_counter, blend_files=blend_files, gltf_files=gltf_files, 
-                                 bin_files=bin_files, images=images, 
-                                 color=n_material["color_map"], height=n_material["height_map"], 
-                                 normal=n_material["normal_map"], roughness=n_material["roughness_map"], 
-                                 metal=n_material["metal_map"], bump=n_material["bump_map"], 
-                                 ao=n_material["ao_map"], opacity=n_material["opacity_map"])
-                
-                if key in n_material_pattern.keys():
-                    n_material_pattern[key] += 1
-                else:
-                    n_material_pattern[key] = 1
+    for cur_material in material_index["materials"]:
+        n_materials += 1
+
+        file_types = cur_material["file_types"]
+        n_material = cur_material["counts"]
+
+        key = create_key(file_counter=sum(file_types.values()), blend_files=file_types.get("blend", 0), 
+                         gltf_files=file_types.get("gltf", 0), bin_files=file_types.get("bin", 0), 
+                         images=file_types.get("png", 0)+file_types.get("jpg", 0), 
+                         color=n_material["color_map"], height=n_material["height_map"], 
+                         normal=n_material["normal_map"], roughness=n_material["roughness_map"], 
+                         metal=n_material["metal_map"], bump=n_material["bump_map"], 
+                         ao=n_material["ao_map"], opacity=n_material["opacity_map"])
+        
+        if key in n_material_pattern.keys():
+            n_material_pattern[key] += 1
+        else:
+            n_material_pattern[key] = 1
 
     print(f"Founded {n_materials} materials.")
     print(f"Details:")
@@ -476,6 +788,8 @@ def img_map_2_gltf(input_directory, output_directory):
             process_textures(input_directory)
 
 def get_input_value(input_socket):
+    import bpy
+
     if input_socket.is_linked:
         # If the input is linked to another node, follow the link
         linked_node = input_socket.links[0].from_node
@@ -491,6 +805,8 @@ def get_input_value(input_socket):
         return value
 
 def blend_to_json(blend_dir_path, export_path):
+    import bpy
+
     for cur_file in os.listdir(blend_dir_path):
         blend_file_path = os.path.join(blend_dir_path, cur_file)
         # blend_file_export_path = os.path.join(export_path, f'{".".join(cur_file.split(".")[:-1])}.gltf')
@@ -570,7 +886,15 @@ def blend_to_json(blend_dir_path, export_path):
 
             print(f"Material data saved to {blend_file_export_path}")
 
-def blender_prep(source_path, dest_path):
+def blender_prep(source_path, dest_path, catalog_path=None):
+    if catalog_path:
+        for cur_entry in update_material_catalog(source_path, catalog_path):
+            # only materials with a blend file
+            if cur_entry["file_types"].get("blend", 0) > 0:
+                cur_dest_path = os.path.join(dest_path, cur_entry["category"], cur_entry["name"])
+                blend_to_json(cur_entry["path"], cur_dest_path)
+        return
+
     for category in os.listdir(source_path):
         for material in os.listdir(os.path.join(source_path, category)):
             if os.path.isdir(os.path.join(source_path, category, material)):
@@ -580,6 +904,8 @@ def blender_prep(source_path, dest_path):
 
 # Function to create a new material in Blender from JSON data
 def create_material_from_json(json_file_path, show=False):
+    import bpy
+
     with open(json_file_path, 'r') as json_file:
         material_data = json.load(json_file)
 
@@ -652,14 +978,19 @@ def create_material_from_json(json_file_path, show=False):
 
         return mat
 
-def load_random_material(source_path):
+def load_random_material(source_path, catalog_path=None):
     all_materials = []
-    for category in os.listdir(source_path):
-        for material in os.listdir(os.path.join(source_path, category)):
-            if os.path.isdir(os.path.join(source_path, category, material)):
-                json_path = os.path.join(source_path, category, material, "material_data.json")
-                if os.path.exists(json_path):
-                    all_materials += [json_path]
+    if catalog_path:
+        for cur_entry in update_material_catalog(source_path, catalog_path):
+            if cur_entry["material_data"]:
+                all_materials += [cur_entry["material_data"]]
+    else:
+        for category in os.listdir(source_path):
+            for material in os.listdir(os.path.join(source_path, category)):
+                if os.path.isdir(os.path.join(source_path, category, material)):
+                    json_path = os.path.join(source_path, category, material, "material_data.json")
+                    if os.path.exists(json_path):
+                        all_materials += [json_path]
 
     random_mat = random.choice(all_materials)
     mat = create_material_from_json(random_mat, show=True)
@@ -668,42 +999,11 @@ def cv_img_is_none(cv_img):
     return cv_img is None or not isinstance(cv_img, np.ndarray) or cv_img.size == 0
 
 def combine_metal_roughness(metal_path, roughness_path, output_path):
-    # Lade die beiden Bilder in Graustufen
-    metal_img = cv2.imread(metal_path, cv2.IMREAD_GRAYSCALE)  # Metall in Blau-Kanal
-    roughness_img = cv2.imread(roughness_path, cv2.IMREAD_GRAYSCALE)  # Rauheit in Grün-Kanal
-    
-    # Überprüfe, ob die Bilder geladen wurden
-    if cv_img_is_none(metal_img) and cv_img_is_none(roughness_img):
-        # raise Exception(f"Could not load metal and roughness texture. Both are None.")
-        print(f"Could not load metal and roughness texture. Both are None.")
-        return
-    if cv_img_is_none(metal_img):
-        print(f"Could not load metal texture from {metal_path}")
-    if cv_img_is_none(roughness_img):
-        print(f"Could not load roughness texture from {roughness_path}")
-    
-    # Überprüfe, ob die Größen übereinstimmen
-    if not cv_img_is_none(metal_img) and not cv_img_is_none(roughness_img):
-        if metal_img.shape != roughness_img.shape:
-            if np.sum(metal_img.shape) < np.sum(roughness_img.shape):
-                print(f"Resizing roughness image from {roughness_img.shape} to {metal_img.shape}")
-                roughness_img = cv2.resize(roughness_img, (metal_img.shape[1], metal_img.shape[0]))
-            else:
-                print(f"Resizing metal image from {metal_img.shape} to {roughness_img.shape}  ")
-                metal_img = cv2.resize(metal_img, (roughness_img.shape[1], roughness_img.shape[0]))
-    
-    # Erstelle ein leeres Bild mit 3 Kanälen (BGR)
-    height, width = metal_img.shape if not cv_img_is_none(metal_img) else roughness_img.shape
-    combined_img = np.zeros((height, width, 3), dtype=np.uint8)
-    
-    # Weisen den Blau-Kanal der Metal-Textur zu und den Grün-Kanal der Roughness-Textur
-    combined_img[:, :, 0] = metal_img if not cv_img_is_none(metal_img) else 0  # Blau für Metalness
-    combined_img[:, :, 1] = roughness_img if not cv_img_is_none(roughness_img)  else 0  # Grün für Roughness
-    combined_img[:, :, 2] = 0  # Rot bleibt auf 0
-    
-    # Speichere das kombinierte Bild
-    cv2.imwrite(output_path, combined_img)
-    print(f"Combined image saved to {output_path}")
+    # metal in blue channel, roughness in green channel, red stays 0 -> see texture_channels
+    # missing maps stay 0 like before (not the neutral ORM defaults)
+    if pack_channels(output_path, roughness_path=roughness_path, metal_path=metal_path,
+                     defaults={"ao": 0, "roughness": 0, "metal": 0}):
+        print(f"Combined image saved to {output_path}")
 
 def create_material_json(source_path, material_name):
     """
@@ -829,7 +1129,7 @@ def create_material_json(source_path, material_name):
             "images": images
             }
 
-def prep_images(source_path, output_path):
+def prep_images(source_path, output_path, material_index=None, catalog_path=None):
     """
     Converts images to a specific format with info file:
 
@@ -838,111 +1138,296 @@ def prep_images(source_path, output_path):
         color.jpg
         ...
     """
+    if material_index is None:
+        material_index = get_material_index(source_path, extract_arm_file=True, catalog_path=catalog_path)
+
     counter = 0
-    for cur_category in os.listdir(source_path):
-        for cur_dir in os.listdir(os.path.join(source_path, cur_category)):
-            cur_path = os.path.join(source_path, cur_category, cur_dir)
-            if os.path.isdir(cur_path):
-                # get all material files
-                material = find_material(cur_path, extract_arm_file=True)
-
-                # copy all files to new output path
-                cur_output_path = os.path.join(output_path, cur_category, cur_dir)
-                cur_output_material_path = os.path.join(cur_output_path, "textures")
-                if os.path.exists(cur_output_path):
-                    shutil.rmtree(cur_output_path)
-                os.makedirs(cur_output_material_path, exist_ok=True)
-
-                for key, value in material.items():
-                    if value:
-                        # could also give key in material_name_mapping and should get standardized name
-                        name = get_standardized_material_name(value.split("/")[-1])
-                        new_output_material_path = os.path.join(cur_output_material_path, name)
-                        shutil.copy(value, new_output_material_path)
-
-                if "roughness_map" in material.keys() and "metal_map" in material.keys():
-                    combine_metal_roughness(metal_path=material["metal_map"], roughness_path=material["roughness_map"],
-                                             output_path=os.path.join(cur_output_material_path, "MetalRoughness.jpg"))
-
-                # create material_data.json file (in cur_output_path)
-                name = cur_dir.replace("-Unreal-Engine", "").replace("-ue", "")
-                json_file_content = create_material_json(cur_output_path, name)
-
-                with open(os.path.join(cur_output_path, 'material_data.json'), 'w') as json_file:
-                    json.dump(json_file_content, json_file, indent=4)
-
-                print(f"Successfull created new Json file and textures at {cur_output_path}!")
-                counter += 1
+    for cur_material in material_index["materials"]:
+        cur_category, cur_dir = cur_material["category"], cur_material["name"]
+
+        # get all material files
+        material = cur_material["maps"]
+
+        # copy all files to new output path
+        cur_output_path = os.path.join(output_path, cur_category, cur_dir)
+        cur_output_material_path = os.path.join(cur_output_path, "textures")
+        if os.path.exists(cur_output_path):
+            shutil.rmtree(cur_output_path)
+        os.makedirs(cur_output_material_path, exist_ok=True)
+
+        for key, value in material.items():
+            if value:
+                # could also give key in material_name_mapping and should get standardized name
+                name = get_standardized_material_name(value.split("/")[-1])
+                new_output_material_path = os.path.join(cur_output_material_path, name)
+                shutil.copy(value, new_output_material_path)
+
+        if "roughness_map" in material.keys() and "metal_map" in material.keys():
+            combine_metal_roughness(metal_path=material["metal_map"], roughness_path=material["roughness_map"],
+                                     output_path=os.path.join(cur_output_material_path, "MetalRoughness.jpg"))
+
+        # create material_data.json file (in cur_output_path)
+        name = cur_dir.replace("-Unreal-Engine", "").replace("-ue", "")
+        json_file_content = create_material_json(cur_output_path, name)
+
+        with open(os.path.join(cur_output_path, 'material_data.json'), 'w') as json_file:
+            json.dump(json_file_content, json_file, indent=4)
+
+        print(f"Successfull created new Json file and textures at {cur_output_path}!")
+        counter += 1
 
     print(f"\n Finish! Successfull transformed {counter} materials!")
 
-def unreal_prep_images(source_path, output_path):
+def unreal_prep_images(source_path, output_path, material_index=None, catalog_path=None):
     """
     Converts images to a standaridzed name
     """
+    if material_index is None:
+        material_index = get_material_index(source_path, extract_arm_file=True, catalog_path=catalog_path)
+
     counter = 0
-    for cur_category in os.listdir(source_path):
-        for cur_dir in os.listdir(os.path.join(source_path, cur_category)):
-            cur_path = os.path.join(source_path, cur_category, cur_dir)
-            if os.path.isdir(cur_path):
-                # get all material files
-                material = find_material(cur_path, extract_arm_file=True)
-
-                # copy all files to new output path
-                cur_output_path = os.path.join(output_path, cur_category, cur_dir)
-                if os.path.exists(cur_output_path):
-                    shutil.rmtree(cur_output_path)
-                os.makedirs(cur_output_path, exist_ok=True)
-
-                for key, value in material.items():
-                    if value:
-                        # could also give key in material_name_mapping and should get standardized name
-                        name = get_standardized_material_name(value.split("/")[-1])
-                        new_output_material_path = os.path.join(cur_output_path, name)
-                        shutil.copy(value, new_output_material_path)
-
-                print(f"Successfull created standardized textures at {cur_output_path}!")
-                counter += 1
+    for cur_material in material_index["materials"]:
+        # get all material files
+        material = cur_material["maps"]
+
+        # copy all files to new output path
+        cur_output_path = os.path.join(output_path, cur_material["category"], cur_material["name"])
+        if os.path.exists(cur_output_path):
+            shutil.rmtree(cur_output_path)
+        os.makedirs(cur_output_path, exist_ok=True)
+
+        for key, value in material.items():
+            if value:
+                # could also give key in material_name_mapping and should get standardized name
+                name = get_standardized_material_name(value.split("/")[-1])
+                new_output_material_path = os.path.join(cur_output_path, name)
+                shutil.copy(value, new_output_material_path)
+
+        print(f"Successfull created standardized textures at {cur_output_path}!")
+        counter += 1
 
     print(f"\n Finish! Successfull transformed {counter} materials!")
 
-def unreal_renameing(source_path, output_path):
+def unreal_renameing(source_path, output_path, material_index=None, catalog_path=None):
     if os.path.exists(output_path):
         shutil.rmtree(output_path)
     else:
         os.makedirs(output_path, exist_ok=True)
+
+    if material_index is None:
+        material_index = get_material_index(source_path, extract_arm_file=True, catalog_path=catalog_path)
     
     counter = 0
 
-    for cur_category in os.listdir(source_path):
-        for cur_material in os.listdir(os.path.join(source_path, cur_category)):
-            cur_path = os.path.join(source_path, cur_category, cur_material)
-            if os.path.isdir(cur_path):
-                # get all material files
-                material = find_material(cur_path, extract_arm_file=True)
-
-                # copy all files to new output path
-                cur_output_path = os.path.join(output_path, f"3xM_Material_ID_{counter}")
-                if os.path.exists(cur_output_path):
-                    shutil.rmtree(cur_output_path)
-                os.makedirs(cur_output_path, exist_ok=True)
-
-                for key, value in material.items():
-                    if value:
-                        # could also give key in material_name_mapping and should get standardized name
-                        name = get_standardized_material_name(value.split("/")[-1])
-                        new_output_material_path = os.path.join(cur_output_path, name)
-                        shutil.copy(value, new_output_material_path)
-
-                print(f"Successfull created standardized textures at {cur_output_path}!")
-                counter += 1
+    for cur_material in material_index["materials"]:
+        # get all material files
+        material = cur_material["maps"]
+
+        # copy all files to new output path
+        cur_output_path = os.path.join(output_path, f"3xM_Material_ID_{counter}")
+        if os.path.exists(cur_output_path):
+            shutil.rmtree(cur_output_path)
+        os.makedirs(cur_output_path, exist_ok=True)
+
+        for key, value in material.items():
+            if value:
+                # could also give key in material_name_mapping and should get standardized name
+                name = get_standardized_material_name(value.split("/")[-1])
+                new_output_material_path = os.path.join(cur_output_path, name)
+                shutil.copy(value, new_output_material_path)
+
+        print(f"Successfull created standardized textures at {cur_output_path}!")
+        counter += 1
 
     print(f"\n Finish! Successfull renamed {counter} materials!")
 
+def list_material_dirs(source_path):
+    """
+    Returns all (category, material name, material path) sorted by category and material name.
+    """
+    material_dirs = []
+    with os.scandir(source_path) as categories:
+        for cur_category in categories:
+            if not cur_category.is_dir():
+                continue
+            with os.scandir(cur_category.path) as cur_materials:
+                for cur_material in cur_materials:
+                    if cur_material.is_dir():
+                        material_dirs += [(cur_category.name, cur_material.name, cur_material.path)]
+    return sorted(material_dirs)
+
+def print_stage_report(stage, n_materials, duration, n_bytes=None):
+    report = f"    -> {stage}: {n_materials} materials in {duration:.1f}s ({n_materials/max(duration, 1e-6):.1f} materials/s"
+    if n_bytes is not None:
+        report += f", {(n_bytes/1024**2)/max(duration, 1e-6):.1f} MB/s"
+    print(report + ")")
+
+def scan_material_task(material_path, extract_arm_file):
+    # ARM extraction is CPU-bound -> runs in a process
+    material, _, _ = scan_material(material_path, extract_arm_file=extract_arm_file)
+    return material
+
+def downscale_texture(source_path, output_path, max_resolution=None, mip_levels=0):
+    """
+    Writes the texture with a max resolution (biggest side) to the output path, using area interpolation.
+    If the texture is already small enough and no mips are wanted, the file just gets copied.
+
+    mip_levels -> amount of precomputed mip levels (every level halves the size), 
+                  saved as mips/<texture name>/mip_<level>.<ending> next to the output file
+
+    Returns the written bytes.
+    """
+    if not max_resolution and mip_levels <= 0:
+        shutil.copy(source_path, output_path)
+        return os.path.getsize(output_path)
+
+    img = cv2.imread(source_path, cv2.IMREAD_UNCHANGED)
+    if cv_img_is_none(img):
+        print(f"Could not load texture from {source_path} -> copy it without downscaling")
+        shutil.copy(source_path, output_path)
+        return os.path.getsize(output_path)
+
+    # jpg only supports 8 bit
+    ending = output_path.split(".")[-1].lower()
+    if ending in ["jpg", "jpeg"] and img.dtype == np.uint16:
+        img = (img / 257).astype(np.uint8)
+
+    height, width = img.shape[:2]
+    written_bytes = 0
+    if max_resolution and max(height, width) > max_resolution:
+        scale = max_resolution / max(height, width)
+        img = cv2.resize(img, (max(1, int(width*scale)), max(1, int(height*scale))), interpolation=cv2.INTER_AREA)
+        cv2.imwrite(output_path, img)
+    else:
+        shutil.copy(source_path, output_path)
+    written_bytes += os.path.getsize(output_path)
+
+    if mip_levels > 0:
+        mip_path = os.path.join(os.path.dirname(output_path), "mips", ".".join(os.path.basename(output_path).split(".")[:-1]))
+        os.makedirs(mip_path, exist_ok=True)
+        for cur_level in range(1, mip_levels+1):
+            height, width = img.shape[:2]
+            if min(height, width) < 2:
+                break
+            img = cv2.resize(img, (width//2, height//2), interpolation=cv2.INTER_AREA)
+            cur_mip_path = os.path.join(mip_path, f"mip_{cur_level}.{ending}")
+            cv2.imwrite(cur_mip_path, img)
+            written_bytes += os.path.getsize(cur_mip_path)
+
+    return written_bytes
+
+def copy_material_task(material, cur_output_path, max_resolution=None, mip_levels=0):
+    """
+    Copies all material maps with standardized names to the output path.
+
+    max_resolution -> dict: attribute -> max resolution (see MAX_TEXTURE_RESOLUTION) or None for simple copies
+    mip_levels -> amount of precomputed mip levels per texture
+
+    Returns (source bytes, written bytes).
+    """
+    if os.path.exists(cur_output_path):
+        shutil.rmtree(cur_output_path)
+    os.makedirs(cur_output_path, exist_ok=True)
+
+    source_bytes = 0
+    written_bytes = 0
+    for key, value in material.items():
+        if value:
+            name = get_standardized_material_name(value.split("/")[-1])
+            new_output_material_path = os.path.join(cur_output_path, name)
+            cur_max_resolution = max_resolution.get(key) if max_resolution else None
+            written_bytes += downscale_texture(value, new_output_material_path, cur_max_resolution, mip_levels)
+            source_bytes += os.path.getsize(value)
+    return source_bytes, written_bytes
+
+def finish_prep_images_task(material, cur_output_path, name):
+    # combine metal and roughness and create the material_data.json (for prep_images)
+    cur_output_material_path = os.path.join(cur_output_path, "textures")
+    if material["roughness_map"] or material["metal_map"]:
+        combine_metal_roughness(metal_path=material["metal_map"] or "", roughness_path=material["roughness_map"] or "",
+                                output_path=os.path.join(cur_output_material_path, "MetalRoughness.jpg"))
+
+    json_file_content = create_material_json(cur_output_path, name)
+    with open(os.path.join(cur_output_path, 'material_data.json'), 'w') as json_file:
+        json.dump(json_file_content, json_file, indent=4)
+
+def prep_materials_parallel(source_path, output_path, mode="unreal_renameing", n_jobs=-1, n_copy_threads=16, 
+                            max_resolution=None, mip_levels=0):
+    """
+    Parallel version of prep_images, unreal_prep_images and unreal_renameing.
+
+    mode -> "prep_images", "unreal_prep_images" or "unreal_renameing"
+
+    Stages:
+    1. scan + ARM extraction (processes)
+    2. copy of the textures (threads, I/O-bound) 
+       or downscaling to max_resolution (dict: attribute -> max size, see MAX_TEXTURE_RESOLUTION) 
+       with optional mip_levels (processes, CPU-bound)
+    3. metal-roughness combination + material_data.json (processes, only for prep_images)
+
+    The 3xM_Material_ID_{n} (unreal_renameing) is assigned in the sorted order of (category, material name), 
+    so it does not depend on the loop or finish order.
+    """
+    if mode not in ["prep_images", "unreal_prep_images", "unreal_renameing"]:
+        raise ValueError(f"Unknown mode '{mode}'. Choose 'prep_images', 'unreal_prep_images' or 'unreal_renameing'.")
+
+    if mode == "unreal_renameing" and os.path.exists(output_path):
+        shutil.rmtree(output_path)
+    os.makedirs(output_path, exist_ok=True)
+
+    print(f"Start parallel material preparation ({mode})...")
+    material_dirs = list_material_dirs(source_path)
+
+    # 1. scan
+    start_time = time.time()
+    materials = Parallel(n_jobs=n_jobs)(
+        delayed(scan_material_task)(cur_path, True)
+        for _, _, cur_path in material_dirs
+    )
+    print_stage_report("Scan", len(materials), time.time()-start_time)
+
+    output_paths = []
+    for idx, (cur_category, cur_name, _) in enumerate(material_dirs):
+        if mode == "unreal_renameing":
+            output_paths += [os.path.join(output_path, f"3xM_Material_ID_{idx}")]
+        else:
+            output_paths += [os.path.join(output_path, cur_category, cur_name)]
+
+    # 2. copy / downscale
+    start_time = time.time()
+    should_downscale = max_resolution or mip_levels > 0
+    copy_results = Parallel(n_jobs=n_jobs if should_downscale else n_copy_threads, prefer="processes" if should_downscale else "threads")(
+        delayed(copy_material_task)(cur_material, os.path.join(cur_output_path, "textures") if mode == "prep_images" else cur_output_path, 
+                                    max_resolution, mip_levels)
+        for cur_material, cur_output_path in zip(materials, output_paths)
+    )
+    if should_downscale:
+        for cur_output_path, (source_bytes, written_bytes) in zip(output_paths, copy_results):
+            print(f"    {cur_output_path}: {source_bytes/1024**2:.1f} MB -> {written_bytes/1024**2:.1f} MB (saved {(source_bytes-written_bytes)/1024**2:.1f} MB)")
+        total_source_bytes = sum([i for i, _ in copy_results])
+        total_written_bytes = sum([i for _, i in copy_results])
+        print(f"Texture downscaling saved {(total_source_bytes-total_written_bytes)/1024**2:.1f} MB of {total_source_bytes/1024**2:.1f} MB")
+    print_stage_report("Downscale" if should_downscale else "Copy", len(materials), time.time()-start_time, 
+                       n_bytes=sum([i for _, i in copy_results]))
+
+    # 3. combine + json
+    if mode == "prep_images":
+        start_time = time.time()
+        Parallel(n_jobs=n_jobs)(
+            delayed(finish_prep_images_task)(cur_material, cur_output_path, cur_name.replace("-Unreal-Engine", "").replace("-ue", ""))
+            for cur_material, cur_output_path, (_, cur_name, _) in zip(materials, output_paths, material_dirs)
+        )
+        print_stage_report("Combine + Json", len(materials), time.time()-start_time)
+
+    print(f"\n Finish! Successfull prepared {len(materials)} materials!")
+
 def change_type(source_path, dest_path):
     for cur_dir in os.listdir(source_path):
         for cur_file in os.listdir(os.path.join(source_path, cur_dir)):
             cur_src_path = os.path.join(source_path, cur_dir, cur_file)
+            # for example the mips folder of downscale_texture
+            if not os.path.isfile(cur_src_path):
+                continue
             cur_dest_path = os.path.join(dest_path, cur_dir, f"{cur_file.split('.')[0]}.png")
 
             os.makedirs(os.path.join(dest_path, cur_dir), exist_ok=True, mode=777)
@@ -979,5 +1464,8 @@ if __name__ == "__main__":
 
     # unreal_renameing(source_path="D:/Informatik/Projekte/3xM/model_material/brian_500_prep_ue_ssim_index", output_path="D:/Informatik/Projekte/3xM/final_materials")
 
+    # prep_materials_parallel(source_path="D:/Informatik/Projekte/3xM/model_material/brian_500_prep_ue_ssim_index", output_path="D:/Informatik/Projekte/3xM/final_materials", mode="unreal_renameing", 
+    #                         max_resolution=MAX_TEXTURE_RESOLUTION, mip_levels=0)
+
     change_type(source_path="./final_materials", dest_path="./final_materials_UE")
 
@@ -1,9 +1,17 @@
 import os
+import sys
+import time
 import shutil
+import subprocess
 import trimesh
 import json
+import numpy as np
+from urllib.parse import quote, unquote
+from joblib import Parallel, delayed
 from pygltflib import GLTF2, Buffer, BufferView, Accessor, Mesh, Primitive, Node, Scene, Asset, BufferFormat
-import bpy
+
+# bpy gets imported only in the Blender functions -> the trimesh functions and their worker processes
+# don't need Blender (and don't pay its startup)
 
 # Convert .usdc and .obj to .gltf and .bin (ignoring materials)
 def convert_to_gltf_bin(source_path, destination_path):
@@ -32,6 +40,8 @@ def convert_to_gltf_bin(source_path, destination_path):
             print(f'Converted {file_name} to {gltf_path}')
 
 def convert_stl_to_glb(source_path, output_path):
+    import bpy
+
     if os.path.exists(output_path):
         shutil.rmtree(output_path)
     else:
@@ -62,6 +72,8 @@ def convert_stl_to_glb(source_path, output_path):
             idx += 1
 
 def convert_stl_to_fbx(source_path, output_path):
+    import bpy
+
     if os.path.exists(output_path):
         shutil.rmtree(output_path)
     else:
@@ -100,6 +112,8 @@ def convert_stl_to_gltf_bin(source_file_path, dest_path, name, export_format="GL
     :param name: Name for the output file (without extension).
     :param export_format: GLTF export format. Can be 'GLTF_SEPARATE' (default), 'GLTF_EMBEDDED', or 'GLB'.
     """
+    import bpy
+
     # Clear existing meshes in the scene
     bpy.ops.wm.read_factory_settings(use_empty=True)
 
@@ -115,6 +129,317 @@ def convert_stl_to_gltf_bin(source_file_path, dest_path, name, export_format="GL
     
     print(f"File successfully converted to {output_file_path}")
 
+# file ending for every export format
+EXPORT_ENDINGS = {
+    "GLB": ".glb",
+    "GLTF_SEPARATE": ".gltf",
+    "GLTF_EMBEDDED": ".gltf",
+    "FBX": ".fbx"
+}
+
+def clear_blender_scene():
+    """
+    Removes all objects and the orphan data (meshes, materials, ...) from the current scene.
+    Much faster than a factory reset for every model.
+    """
+    import bpy
+
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+
+    for data_collection in [bpy.data.meshes, bpy.data.materials, bpy.data.images]:
+        for data_block in list(data_collection):
+            if data_block.users == 0:
+                data_collection.remove(data_block)
+
+    try:
+        bpy.ops.outliner.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+    except RuntimeError:
+        # the purge needs a fitting context -> the data above got already removed
+        pass
+
+def convert_stl_in_session(source_file_path, output_file_path, export_format="GLB"):
+    """
+    Imports a STL file into the current scene and exports it. The scene should be empty.
+    """
+    import bpy
+
+    bpy.ops.wm.stl_import(filepath=source_file_path)
+
+    # choose every object
+    bpy.ops.object.select_all(action='SELECT')
+
+    # convert to mesh
+    bpy.ops.object.convert(target='MESH')
+
+    if export_format == "FBX":
+        bpy.ops.export_scene.fbx(filepath=output_file_path)
+    else:
+        bpy.ops.export_scene.gltf(filepath=output_file_path, export_format=export_format)
+
+def claim_job(claim_dir, job_idx):
+    # atomic file creation -> only one worker gets the job
+    try:
+        file_descriptor = os.open(os.path.join(claim_dir, f"{job_idx}.claim"), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(file_descriptor)
+        return True
+    except FileExistsError:
+        return False
+
+def run_conversion_jobs(jobs, export_format="GLB", log_path=None, claim_dir=None):
+    """
+    Converts all jobs [(source file path, output file path), ...] in one Blender session.
+
+    Between the files only the imported data gets cleared (no factory reset).
+    With claim_dir multiple workers can share the same job list.
+    Every file gets logged (json-lines) before the conversion ("start") and after it ("end") 
+    with the needed time and a possible error -> a start without end means the worker crashed on this file.
+
+    Returns (success, fail)
+    """
+    import bpy
+
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+
+    success = 0
+    fail = 0
+    log_file = open(log_path, "a") if log_path else None
+    for job_idx, (source_file_path, output_file_path) in enumerate(jobs):
+        if claim_dir and not claim_job(claim_dir, job_idx):
+            continue
+
+        if log_file:
+            log_file.write(json.dumps({"event": "start", "job": job_idx, "source": source_file_path}) + "\n")
+            log_file.flush()
+
+        start_time = time.time()
+        error = None
+        try:
+            convert_stl_in_session(source_file_path, output_file_path, export_format)
+            success += 1
+        except Exception as e:
+            error = str(e)
+            fail += 1
+            print(f"Error during converting {source_file_path}: {e}")
+        clear_blender_scene()
+
+        if log_file:
+            log_file.write(json.dumps({"event": "end", "job": job_idx, "source": source_file_path, "output": output_file_path, 
+                                       "seconds": time.time()-start_time, "success": error is None, "error": error}) + "\n")
+            log_file.flush()
+
+    if log_file:
+        log_file.close()
+    return success, fail
+
+def run_blender_worker(work_dir, worker_id):
+    # entry point for the worker processes of convert_stl_batch
+    with open(os.path.join(work_dir, "jobs.json"), "r") as jobs_file:
+        job_info = json.load(jobs_file)
+
+    run_conversion_jobs(job_info["jobs"], export_format=job_info["export_format"], 
+                        log_path=os.path.join(work_dir, f"log_{worker_id}.jsonl"), 
+                        claim_dir=os.path.join(work_dir, "claims"))
+
+def convert_stl_batch(source_path, output_path, export_format="GLB", n_workers=4, work_dir=None):
+    """
+    Batch version of convert_stl_to_glb and convert_stl_to_fbx.
+
+    Starts n_workers headless Python processes with their own Blender session (bpy module),
+    which share one job list. Every worker keeps its session and only clears the imported data between the files.
+
+    The files are named 3xM_Model_ID_{idx} in the same order as convert_stl_to_fbx and get_license_from_stl_to_fbx.
+    Timing and failures of every file are written to the log files in the work_dir and summarized at the end.
+    """
+    if export_format not in EXPORT_ENDINGS:
+        raise ValueError(f"Unknown export format '{export_format}'. Choose one of {list(EXPORT_ENDINGS.keys())}.")
+
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)
+    os.makedirs(output_path, exist_ok=True)
+
+    if work_dir is None:
+        work_dir = os.path.join(output_path, "..", f"{os.path.basename(os.path.normpath(output_path))}_conversion")
+
+    jobs = []
+    # sorted -> same IDs on every machine and in convert_stl_trimesh_batch
+    for cur_file in sorted(os.listdir(source_path)):
+        cur_path = os.path.join(source_path, cur_file)
+        if os.path.isfile(cur_path) and cur_file.endswith(".stl"):
+            jobs += [(cur_path, os.path.join(output_path, f"3xM_Model_ID_{len(jobs)}{EXPORT_ENDINGS[export_format]}"))]
+
+    run_blender_workers(jobs, export_format, n_workers, work_dir)
+
+def run_blender_workers(jobs, export_format, n_workers, work_dir):
+    """
+    Runs the conversion jobs [(source file path, output file path), ...] in n_workers processes 
+    with their own Blender session and prints a summary.
+    """
+    if os.path.exists(work_dir):
+        shutil.rmtree(work_dir)
+    os.makedirs(os.path.join(work_dir, "claims"), exist_ok=True)
+
+    with open(os.path.join(work_dir, "jobs.json"), "w") as jobs_file:
+        json.dump({"export_format": export_format, "jobs": jobs}, jobs_file)
+
+    start_time = time.time()
+    workers = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--blender-worker", work_dir, str(worker_id)]) 
+               for worker_id in range(n_workers)]
+    return_codes = [cur_worker.wait() for cur_worker in workers]
+
+    # summary
+    started = set()
+    logs = []
+    for worker_id in range(n_workers):
+        cur_log_path = os.path.join(work_dir, f"log_{worker_id}.jsonl")
+        if os.path.exists(cur_log_path):
+            with open(cur_log_path, "r") as log_file:
+                for line in log_file:
+                    try:
+                        cur_log = json.loads(line)
+                    except ValueError:
+                        # broken last line of a crashed worker
+                        continue
+                    if cur_log["event"] == "start":
+                        started.add(cur_log["job"])
+                    else:
+                        logs += [cur_log]
+
+    finished = set([cur_log["job"] for cur_log in logs])
+    # started but not finished -> the worker crashed on this file, never started -> all workers crashed before
+    crashed = sorted(started - finished)
+    missing = sorted(set(range(len(jobs))) - started)
+
+    failed = [cur_log for cur_log in logs if not cur_log["success"]]
+    duration = time.time()-start_time
+    print(f"Converted {len(logs)-len(failed)}/{len(jobs)} files in {duration:.1f}s ({len(logs)/max(duration, 1e-6):.2f} files/s).")
+    if len(logs) > 0:
+        print(f"    -> mean time per file: {sum([cur_log['seconds'] for cur_log in logs])/len(logs):.2f}s")
+    print(f"Failed: {len(failed)}")
+    for cur_log in failed:
+        print(f"    -> {cur_log['source']}: {cur_log['error']}")
+    print(f"Crashed (worker died during the conversion): {len(crashed)}")
+    for job_idx in crashed:
+        print(f"    -> {jobs[job_idx][0]}")
+    print(f"Missing (never started): {len(missing)}")
+    for job_idx in missing:
+        print(f"    -> {jobs[job_idx][0]}")
+    for worker_id, return_code in enumerate(return_codes):
+        if return_code != 0:
+            print(f"Worker {worker_id} exited with code {return_code}")
+
+def export_gltf_with_trimesh(mesh, output_file_path, embed_buffers=False):
+    """
+    Writes the mesh as .gltf with trimesh (like convert_to_gltf_bin).
+
+    embed_buffers -> False writes one .bin file with the name of the .gltf file next to it (GLTF_SEPARATE),
+                     True embeds the data into the .gltf file (GLTF_EMBEDDED)
+
+    Returns the paths of the written files.
+    """
+    base_name = os.path.splitext(os.path.basename(output_file_path))[0]
+    gltf_data = trimesh.exchange.gltf.export_gltf(mesh, include_normals=True, merge_buffers=True, embed_buffers=embed_buffers)
+    gltf = json.loads(gltf_data["model.gltf"])
+
+    written_paths = [output_file_path]
+    for cur_buffer in gltf.get("buffers", []):
+        if cur_buffer["uri"] in gltf_data:
+            # own name for every model -> all models can share one folder
+            bin_path = os.path.join(os.path.dirname(output_file_path), f"{base_name}.bin")
+            with open(bin_path, "wb") as bin_file:
+                bin_file.write(gltf_data[cur_buffer["uri"]])
+            cur_buffer["uri"] = f"{base_name}.bin"
+            written_paths += [bin_path]
+
+    with open(output_file_path, "w") as gltf_file:
+        json.dump(gltf, gltf_file)
+    return written_paths
+
+def convert_mesh_with_trimesh(source_file_path, output_file_path, merge_vertices=True, quantize_decimals=None, export_format="GLB"):
+    """
+    Converts a mesh (for example STL) to GLB, GLTF_SEPARATE or GLTF_EMBEDDED with trimesh, without Blender.
+
+    merge_vertices -> merges duplicate vertices (STL stores every triangle with own vertices)
+    quantize_decimals -> rounds the vertex positions to this amount of decimals before merging (smaller files)
+
+    Returns a dict with the timing, the sizes and a possible error.
+    """
+    start_time = time.time()
+    try:
+        mesh = trimesh.load(source_file_path, force="mesh")
+        n_vertices_before = len(mesh.vertices)
+
+        if quantize_decimals is not None:
+            mesh.vertices = np.round(mesh.vertices, quantize_decimals)
+        if merge_vertices or quantize_decimals is not None:
+            mesh.merge_vertices()
+            # quantization can collapse small triangles
+            mesh.update_faces(mesh.nondegenerate_faces())
+
+        if export_format == "GLB":
+            mesh.export(output_file_path, file_type="glb")
+            written_paths = [output_file_path]
+        elif export_format in ["GLTF_SEPARATE", "GLTF_EMBEDDED"]:
+            written_paths = export_gltf_with_trimesh(mesh, output_file_path, embed_buffers=(export_format == "GLTF_EMBEDDED"))
+        else:
+            raise ValueError(f"trimesh can't export {export_format}")
+
+        return {"source": source_file_path, "output": output_file_path, "seconds": time.time()-start_time, "success": True, "error": None,
+                "vertices_before": n_vertices_before, "vertices_after": len(mesh.vertices), 
+                "bytes_before": os.path.getsize(source_file_path), "bytes_after": sum([os.path.getsize(i) for i in written_paths])}
+    except Exception as e:
+        return {"source": source_file_path, "output": output_file_path, "seconds": time.time()-start_time, "success": False, "error": str(e)}
+
+def convert_stl_trimesh_batch(source_path, output_path, export_format="GLB", n_jobs=-1, merge_vertices=True, quantize_decimals=None, 
+                              n_blender_workers=4):
+    """
+    Converts all STL files to GLB, GLTF_SEPARATE (.gltf + .bin) or GLTF_EMBEDDED with trimesh in a process pool 
+    (no Blender needed, runs on headless machines).
+
+    FBX (trimesh can't export it) and the files trimesh fails on 
+    get converted with the Blender batch conversion (see convert_stl_batch).
+
+    The files are named 3xM_Model_ID_{idx} in the same (sorted) order as convert_stl_batch.
+    """
+    if export_format not in EXPORT_ENDINGS:
+        raise ValueError(f"Unknown export format '{export_format}'. Choose one of {list(EXPORT_ENDINGS.keys())}.")
+
+    if export_format == "FBX":
+        print(f"trimesh can't export {export_format} -> use Blender.")
+        convert_stl_batch(source_path, output_path, export_format=export_format, n_workers=n_blender_workers)
+        return
+
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)
+    os.makedirs(output_path, exist_ok=True)
+
+    jobs = []
+    # sorted -> same IDs as convert_stl_batch
+    for cur_file in sorted(os.listdir(source_path)):
+        cur_path = os.path.join(source_path, cur_file)
+        if os.path.isfile(cur_path) and cur_file.endswith(".stl"):
+            jobs += [(cur_path, os.path.join(output_path, f"3xM_Model_ID_{len(jobs)}{EXPORT_ENDINGS[export_format]}"))]
+
+    start_time = time.time()
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(convert_mesh_with_trimesh)(cur_source, cur_output, merge_vertices, quantize_decimals, export_format)
+        for cur_source, cur_output in jobs
+    )
+    duration = time.time()-start_time
+
+    succeeded = [cur_result for cur_result in results if cur_result["success"]]
+    failed = [(cur_result["source"], cur_result["output"]) for cur_result in results if not cur_result["success"]]
+    print(f"Converted {len(succeeded)}/{len(jobs)} files with trimesh in {duration:.1f}s ({len(jobs)/max(duration, 1e-6):.2f} files/s).")
+    if len(succeeded) > 0:
+        bytes_before = sum([cur_result["bytes_before"] for cur_result in succeeded])
+        bytes_after = sum([cur_result["bytes_after"] for cur_result in succeeded])
+        print(f"    -> {bytes_before/1024**2:.1f} MB -> {bytes_after/1024**2:.1f} MB")
+
+    if len(failed) > 0:
+        print(f"{len(failed)} files failed with trimesh -> use Blender for them.")
+        work_dir = os.path.join(output_path, "..", f"{os.path.basename(os.path.normpath(output_path))}_conversion")
+        run_blender_workers(failed, export_format, n_blender_workers, work_dir)
+
 # Main function to run the conversion
 def ambientcg_formatting(source_dir, dest_dir, new_folder=True):
     for cur_dir in os.listdir(source_dir):
@@ -150,25 +475,88 @@ def thingi10k_formatting(source_dir, dest_dir, use_ID=False):
             convert_stl_to_gltf_bin(cur_file_path, dest_dir, cur_name)
             ID += 1
 
-def extract_gltf_from_subfolder(source_folder, destination_folder, rm_src=False):
+def get_free_name(file_name, used_names):
+    """
+    Returns a file name, which is not in used_names (adds _0, _1, ... to the name) and adds it to used_names.
+    """
+    stem = ".".join(file_name.split(".")[:-1])
+    ending = f".{file_name.split('.')[-1]}"
+    name = file_name
+    counter = 0
+    while name in used_names:
+        name = f"{stem}_{counter}{ending}"
+        counter += 1
+    used_names.add(name)
+    return name
+
+def write_json_file(data, path):
+    with open(path, "w") as json_file:
+        json.dump(data, json_file, indent=4)
+
+def extract_gltf_from_subfolder(source_folder, destination_folder, rm_src=False, n_threads=16):
+    """
+    Copies all .gltf and .bin files from the subfolders into one destination folder.
+
+    Name collisions get solved with an in-memory set of the used names (seeded once with the destination folder).
+    If a .bin file gets renamed, the 'uri' in the .gltf files which reference it get updated.
+    The copying runs in a thread pool.
+    """
+    os.makedirs(destination_folder, exist_ok=True)
+    used_names = set(os.listdir(destination_folder))
 
-    success = 0
+    # plan all copies first -> source bin path -> new bin name
+    gltf_files = []
+    bin_files = []
     for root_dir, cur_dirs, cur_files in os.walk(source_folder):
         for cur_file in cur_files:
-            file_path = os.path.join(root_dir, cur_file)
-            if cur_file.endswith(".gltf") or cur_file.endswith(".bin"):
-                cur_destination = os.path.join(destination_folder, cur_file)
-                counter = 0
-                os.makedirs(destination_folder, exist_ok=True)
-                name = cur_file
-                type = ".gltf" if cur_file.endswith(".gltf") else ".bin"
-                while name in os.listdir(destination_folder):
-                    name = f'{".".join(cur_file.split(".")[:-1])}_{counter}{type}'
-                    counter += 1
-                cur_destination = os.path.join(destination_folder, name)
-                shutil.copyfile(file_path, cur_destination)
-                success += 1
-    print(f"Successfull transfered {success} files.")
+            if cur_file.endswith(".gltf"):
+                gltf_files += [os.path.join(root_dir, cur_file)]
+            elif cur_file.endswith(".bin"):
+                bin_files += [os.path.join(root_dir, cur_file)]
+
+    bin_names = dict()
+    copy_tasks = []
+    write_tasks = []
+    for cur_gltf_path in gltf_files:
+        gltf_name = get_free_name(os.path.basename(cur_gltf_path), used_names)
+        try:
+            with open(cur_gltf_path, "r") as gltf_file:
+                gltf_data = json.load(gltf_file)
+        except Exception as e:
+            print(f"Could not read {cur_gltf_path} ({e}) -> copy it without changes.")
+            copy_tasks += [(cur_gltf_path, os.path.join(destination_folder, gltf_name))]
+            continue
+
+        for cur_buffer in gltf_data.get("buffers", []):
+            uri = cur_buffer.get("uri")
+            if not uri or uri.startswith("data:"):
+                continue
+            cur_bin_path = os.path.normpath(os.path.join(os.path.dirname(cur_gltf_path), unquote(uri)))
+            if not os.path.exists(cur_bin_path):
+                print(f"Buffer {uri} of {cur_gltf_path} does not exist.")
+                continue
+            if cur_bin_path not in bin_names:
+                bin_names[cur_bin_path] = get_free_name(os.path.basename(cur_bin_path), used_names)
+            cur_buffer["uri"] = quote(bin_names[cur_bin_path])
+
+        write_tasks += [(gltf_data, os.path.join(destination_folder, gltf_name))]
+
+    # bin files without gltf file
+    for cur_bin_path in bin_files:
+        cur_bin_path = os.path.normpath(cur_bin_path)
+        if cur_bin_path not in bin_names:
+            bin_names[cur_bin_path] = get_free_name(os.path.basename(cur_bin_path), used_names)
+
+    for cur_bin_path, cur_bin_name in bin_names.items():
+        copy_tasks += [(cur_bin_path, os.path.join(destination_folder, cur_bin_name))]
+
+    # run copies
+    Parallel(n_jobs=n_threads, prefer="threads")(
+        [delayed(shutil.copyfile)(cur_source, cur_destination) for cur_source, cur_destination in copy_tasks] + 
+        [delayed(write_json_file)(cur_data, cur_destination) for cur_data, cur_destination in write_tasks]
+    )
+
+    print(f"Successfull transfered {len(copy_tasks)+len(write_tasks)} files.")
 
             # if rm_src:
             #     shutil.rmtree(os.path.join(source_folder, cur_dir))
@@ -182,24 +570,85 @@ def scale_to_size(mesh, target_size):
     mesh.apply_scale(scale_factor)
     return mesh
 
-def scale_stl(source_path, output_path, target_size=1):
+def normalize_mesh_file(source_file_path, output_file_path, target_size=1, max_faces=None):
+    """
+    Moves the mesh to the center, scales the biggest dimension to target_size and 
+    decimates the mesh, if it has more than max_faces triangles.
+
+    Returns a report dict with the vertex/face counts before and after,
+    "decimated" and a "decimation_error" if the decimation failed (the mesh then gets saved without decimation).
+    """
+    start_time = time.time()
+    report = {"file": os.path.basename(source_file_path), "success": False, "error": None}
+    try:
+        # load stl model
+        mesh = trimesh.load(source_file_path, force="mesh")
+        report["vertices_before"] = len(mesh.vertices)
+        report["faces_before"] = len(mesh.faces)
+
+        # center and scale mesh to target size
+        mesh.apply_translation(-mesh.bounding_box.centroid)
+        mesh = scale_to_size(mesh, target_size)
+
+        # decimate mesh
+        report["decimated"] = False
+        if max_faces and len(mesh.faces) > max_faces:
+            try:
+                # needs the fast_simplification package
+                mesh = mesh.simplify_quadric_decimation(face_count=max_faces)
+                report["decimated"] = True
+            except Exception as e:
+                report["decimation_error"] = str(e)
+                print(f"Could not decimate {source_file_path}: {e}")
+
+        # Save the new sized mesh
+        mesh.export(output_file_path)
+
+        report["vertices_after"] = len(mesh.vertices)
+        report["faces_after"] = len(mesh.faces)
+        report["success"] = True
+    except Exception as e:
+        report["error"] = str(e)
+    report["seconds"] = time.time()-start_time
+    return report
+
+def scale_stl(source_path, output_path, target_size=1, max_faces=None, n_jobs=-1):
+    """
+    Normalizes all STL meshes of a folder in a process pool (centered and scaled to target_size).
+
+    max_faces -> triangle budget, bigger meshes get decimated (less import and render cost in Unreal)
+
+    A report with the vertex/face counts before and after is saved as 'normalization_report.json' in the output path.
+    """
     if os.path.exists(output_path):
         shutil.rmtree(output_path)
     os.makedirs(output_path, exist_ok=True)
 
+    all_files = []
     for cur_file in os.listdir(source_path):
-        if os.path.isfile(cur_file) and cur_file.endswith(".stl"):
-            cur_stl_path = os.path.join(source_path, cur_file)
-
-            # load stl model
-            mesh = trimesh.load('dein_objekt.stl')
-
-            # Scale mesh to target size
-            scale_mesh = scale_to_size(mesh, zielgröße)
-
-            # Save the new sized mesh
-            cur_export_stl_path = os.path.join(output_path, cur_file)
-            scale_mesh.export(cur_export_stl_path)
+        if os.path.isfile(os.path.join(source_path, cur_file)) and cur_file.endswith(".stl"):
+            all_files += [cur_file]
+
+    start_time = time.time()
+    reports = Parallel(n_jobs=n_jobs)(
+        delayed(normalize_mesh_file)(os.path.join(source_path, cur_file), os.path.join(output_path, cur_file), target_size, max_faces)
+        for cur_file in all_files
+    )
+
+    with open(os.path.join(output_path, "normalization_report.json"), "w") as report_file:
+        json.dump(reports, report_file, indent=4)
+
+    succeeded = [cur_report for cur_report in reports if cur_report["success"]]
+    print(f"Normalized {len(succeeded)}/{len(all_files)} meshes in {time.time()-start_time:.1f}s.")
+    if len(succeeded) > 0:
+        print(f"    -> Faces: {sum([i['faces_before'] for i in succeeded])} -> {sum([i['faces_after'] for i in succeeded])}")
+        print(f"    -> Vertices: {sum([i['vertices_before'] for i in succeeded])} -> {sum([i['vertices_after'] for i in succeeded])}")
+    not_decimated = [cur_report for cur_report in succeeded if "decimation_error" in cur_report]
+    if len(not_decimated) > 0:
+        print(f"    -> Decimation failed for {len(not_decimated)} meshes (over max_faces): {not_decimated[0]['decimation_error']}")
+    for cur_report in reports:
+        if not cur_report["success"]:
+            print(f"    -> Failed {cur_report['file']}: {cur_report['error']}")
 
 
 def get_license_from_stl_to_fbx(source_path):
@@ -220,7 +669,10 @@ def get_license_from_stl_to_fbx(source_path):
         md_file.write(license_text)
 
 
-if __name__ == "__main__":
+if __name__ == "__main__" and "--blender-worker" in sys.argv:
+    worker_args = sys.argv[sys.argv.index("--blender-worker")+1:]
+    run_blender_worker(work_dir=worker_args[0], worker_id=int(worker_args[1]))
+elif __name__ == "__main__":
     # Define your source directory containing folders which contains .jpg, .usdc, .obj, and .mtl files
     source_dir = '/home/tobia/data/3xM/models/Thingi10KSorted'
     dest_dir = '/home/tobia/data/3xM/models/Thingi10KSorted_prep'
@@ -233,12 +685,16 @@ if __name__ == "__main__":
 
     # extract_gltf_from_subfolder(source_folder="/home/tobia/data/3xM/models/polyhaven", destination_folder="/home/tobia/data/3xM/models/polyhaven_prep", rm_src=False)
 
-    # scale_stl(source_path="D:/Informatik/Projekte/3xM/model_material/Thingi10KSorted", output_path="D:/Informatik/Projekte/3xM/model_material/Thingi10KSortedScaled")
+    # scale_stl(source_path="D:/Informatik/Projekte/3xM/model_material/Thingi10KSorted", output_path="D:/Informatik/Projekte/3xM/model_material/Thingi10KSortedScaled", target_size=1, max_faces=50000)
 
     # convert_stl_to_glb(source_path="D:/Informatik/Projekte/3xM/model_material/Thingi10KSorted", output_path="D:/Informatik/Projekte/3xM/model_material/final_models")
 
 
     # convert_stl_to_fbx(source_path="D:/Informatik/Projekte/3xM/model_material/Thingi10KSorted", output_path="D:/Informatik/Projekte/3xM/model_material/final_models")
 
+    # convert_stl_batch(source_path="D:/Informatik/Projekte/3xM/model_material/Thingi10KSorted", output_path="D:/Informatik/Projekte/3xM/model_material/final_models", export_format="FBX", n_workers=4)
+
+    # convert_stl_trimesh_batch(source_path="D:/Informatik/Projekte/3xM/model_material/Thingi10KSorted", output_path="D:/Informatik/Projekte/3xM/model_material/final_models", merge_vertices=True, quantize_decimals=5)
+
     # get_license_from_stl_to_fbx(source_path="D:/Informatik/Projekte/3xM/model_material/Thingi10KSorted")
 
@@ -0,0 +1,451 @@
+"""
+Stand-in for the unreal module of the editor -> runs the import scripts without Unreal.
+
+Every call on the stand-in gets recorded in CALLS as (name, args, kwargs), imported and created
+assets are added to ASSETS, so they exist for the next does_asset_exist/load_asset.
+The asset registry returns the assets of REGISTRY.
+Imports and saves sleep LATENCIES seconds, so the checks can compare the time of batched and single calls.
+
+Usage:
+    import unreal_stub
+    unreal_stub.install()    # before importing import_materials or import_fbx_meshes
+    import import_materials
+
+    python unreal_stub.py    # runs the offline checks at the end of this file
+"""
+
+import os
+import sys
+import time
+
+# (name, args, kwargs) of every call
+CALLS = []
+
+# package paths of all existing assets
+ASSETS = set()
+
+# stand-in class of the assets which are no plain StubObject (package path -> class)
+ASSET_CLASSES = dict()
+
+# (asset name, package name, class name) of the assets in the asset registry
+REGISTRY = []
+
+# simulated editor latencies in seconds
+LATENCIES = {
+    "import_call": 0.01,    # every import_asset_tasks call
+    "import_task": 0.001,   # every task of an import_asset_tasks call
+    "save": 0.01            # every save_dirty_packages call and every task with save=True
+}
+
+
+
+def reset():
+    CALLS.clear()
+    ASSETS.clear()
+    ASSET_CLASSES.clear()
+    REGISTRY.clear()
+
+
+
+def install():
+    """
+    Registers this module as unreal, so import unreal returns the stand-in.
+    """
+    sys.modules["unreal"] = sys.modules[__name__]
+    return sys.modules[__name__]
+
+
+
+def get_calls(name):
+    return [(args, kwargs) for cur_name, args, kwargs in CALLS if cur_name == name]
+
+
+
+class StubObject:
+    """
+    Any unreal class, object or enum value.
+
+    - attributes and editor properties are stored in one dict
+    - unknown attributes are new stand-ins (for example unreal.FBXImportType.FBXIT_STATIC_MESH)
+    - calling records the call and returns a new stand-in (for example unreal.FbxImportUI())
+    - stand-ins with the same name are equal
+    """
+    def __init__(self, name, **properties):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_properties", dict(properties))
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if name in self._properties:
+            return self._properties[name]
+        return StubObject(f"{self._name}.{name}")
+
+    def __setattr__(self, name, value):
+        self._properties[name] = value
+
+    def __call__(self, *args, **kwargs):
+        CALLS.append((self._name, args, kwargs))
+        return StubObject(self._name, **kwargs)
+
+    def set_editor_property(self, name, value):
+        self._properties[name] = value
+
+    def get_editor_property(self, name):
+        return self._properties.get(name)
+
+    def __eq__(self, other):
+        return isinstance(other, StubObject) and self._name == other._name
+
+    def __hash__(self):
+        return hash(self._name)
+
+    def __repr__(self):
+        return f"<unreal stand-in {self._name}>"
+
+
+
+def __getattr__(name):
+    # every other class of the unreal module
+    return StubObject(name)
+
+
+
+class AssetImportTask(StubObject):
+    def __init__(self):
+        super().__init__("AssetImportTask", imported_object_paths=[])
+
+
+
+class MaterialInstanceConstant(StubObject):
+    pass
+
+
+
+class AssetTools:
+    def import_asset_tasks(self, tasks):
+        CALLS.append(("AssetTools.import_asset_tasks", (tasks,), dict()))
+        time.sleep(LATENCIES["import_call"] + LATENCIES["import_task"]*len(tasks))
+        for cur_task in tasks:
+            if cur_task.get_editor_property("save"):
+                time.sleep(LATENCIES["save"])
+            # name of the asset = destination name or file name without ending
+            name = cur_task.get_editor_property("destination_name") or \
+                os.path.splitext(os.path.basename(cur_task.get_editor_property("filename")))[0]
+            asset_path = f"{cur_task.get_editor_property('destination_path')}/{name}"
+            ASSETS.add(asset_path)
+            cur_task.set_editor_property("imported_object_paths", [f"{asset_path}.{name}"])
+
+    def create_asset(self, asset_name, package_path, asset_class, factory):
+        CALLS.append(("AssetTools.create_asset", (asset_name, package_path, asset_class, factory), dict()))
+        asset_path = f"{package_path}/{asset_name}"
+        ASSETS.add(asset_path)
+        # stand-in classes (for example MaterialInstanceConstant) create instances of themselves
+        if isinstance(asset_class, type) and issubclass(asset_class, StubObject):
+            ASSET_CLASSES[asset_path] = asset_class
+        else:
+            ASSET_CLASSES.pop(asset_path, None)
+        return ASSET_CLASSES.get(asset_path, StubObject)(asset_path)
+
+
+
+class AssetToolsHelpers:
+    asset_tools = AssetTools()
+
+    @staticmethod
+    def get_asset_tools():
+        return AssetToolsHelpers.asset_tools
+
+
+
+class EditorAssetLibrary:
+    @staticmethod
+    def does_asset_exist(asset_path):
+        CALLS.append(("EditorAssetLibrary.does_asset_exist", (asset_path,), dict()))
+        return asset_path.split(".")[0] in ASSETS
+
+    @staticmethod
+    def load_asset(asset_path):
+        CALLS.append(("EditorAssetLibrary.load_asset", (asset_path,), dict()))
+        # engine assets always exist
+        if asset_path.startswith("/Engine/") or asset_path.split(".")[0] in ASSETS:
+            return ASSET_CLASSES.get(asset_path.split(".")[0], StubObject)(asset_path)
+        return None
+
+    @staticmethod
+    def delete_asset(asset_path):
+        CALLS.append(("EditorAssetLibrary.delete_asset", (asset_path,), dict()))
+        if asset_path.split(".")[0] not in ASSETS:
+            return False
+        ASSETS.discard(asset_path.split(".")[0])
+        ASSET_CLASSES.pop(asset_path.split(".")[0], None)
+        return True
+
+    @staticmethod
+    def save_asset(asset_path):
+        CALLS.append(("EditorAssetLibrary.save_asset", (asset_path,), dict()))
+        return True
+
+    @staticmethod
+    def save_loaded_asset(asset):
+        CALLS.append(("EditorAssetLibrary.save_loaded_asset", (asset,), dict()))
+        return True
+
+
+
+class EditorLoadingAndSavingUtils:
+    @staticmethod
+    def save_dirty_packages(save_map_packages, save_content_packages):
+        CALLS.append(("EditorLoadingAndSavingUtils.save_dirty_packages", (save_map_packages, save_content_packages), dict()))
+        time.sleep(LATENCIES["save"])
+        return True
+
+
+
+class ARFilter(StubObject):
+    def __init__(self, class_names=[], package_paths=[], recursive_paths=False):
+        super().__init__("ARFilter", class_names=list(class_names), package_paths=list(package_paths),
+                         recursive_paths=recursive_paths)
+
+
+
+class AssetRegistry:
+    def get_assets(self, search_filter):
+        """
+        Assets of REGISTRY with one of the class names below one of the package paths.
+        """
+        CALLS.append(("AssetRegistry.get_assets", (search_filter,), dict()))
+        class_names = search_filter.get_editor_property("class_names")
+        package_paths = search_filter.get_editor_property("package_paths")
+        return [StubObject("AssetData", asset_name=asset_name, package_name=package_name, asset_class=class_name)
+                for asset_name, package_name, class_name in REGISTRY
+                if class_name in class_names and any([package_name.startswith(cur_path) for cur_path in package_paths])]
+
+    def scan_paths_synchronous(self, paths):
+        CALLS.append(("AssetRegistry.scan_paths_synchronous", (paths,), dict()))
+
+
+
+class AssetRegistryHelpers:
+    asset_registry = AssetRegistry()
+
+    @staticmethod
+    def get_asset_registry():
+        return AssetRegistryHelpers.asset_registry
+
+
+
+class Paths:
+    saved_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Saved")
+
+    @staticmethod
+    def project_saved_dir():
+        return Paths.saved_dir
+
+
+
+# Offline checks
+def check_import_textures_batched(tmp_dir):
+    import import_materials
+
+    reset()
+    textures = [(os.path.join(tmp_dir, f"color_{idx}.png"), "/Game/3xM/Textures", f"3xM_Color_{idx}") for idx in range(5)]
+    imported_paths = import_materials.import_textures_batched(textures, chunk_size=2)
+
+    assert len(get_calls("AssetTools.import_asset_tasks")) == 3
+    # only the content packages get saved, not the open map
+    assert get_calls("EditorLoadingAndSavingUtils.save_dirty_packages") == [((False, True), dict())]
+    assert imported_paths == [f"/Game/3xM/Textures/3xM_Color_{idx}.3xM_Color_{idx}" for idx in range(5)]
+
+
+
+def check_asset_index(tmp_dir):
+    import import_materials
+
+    reset()
+    import_materials.clear_asset_index()
+    REGISTRY.extend([("3xM_Color_1", "/Game/3xM/Textures/Material_1/3xM_Color_1", "Texture2D"),
+                     ("3xM_Color_10", "/Game/3xM/Textures/Material_10/3xM_Color_10", "Texture2D"),
+                     ("3xM_Material_ID_1", "/Game/3xM/Materials/3xM_Material_ID_1", "MaterialInstanceConstant")])
+
+    # the registry gets searched once for all lookups
+    asset_index = import_materials.get_asset_index(class_names=["Texture2D"])
+    assert import_materials.get_asset_index(class_names=["Texture2D"]) is asset_index
+    assert len(get_calls("AssetRegistry.get_assets")) == 1
+    assert len(asset_index) == 2
+
+    # exact match before the substring match
+    assert import_materials.find_asset_path("3xM_Color_10", asset_index) == "/Game/3xM/Textures/Material_10/3xM_Color_10"
+    assert import_materials.find_asset_path("3xm_color_1", asset_index) == "/Game/3xM/Textures/Material_1/3xM_Color_1"
+    assert import_materials.find_asset_path("Color_1", asset_index) == "/Game/3xM/Textures/Material_1/3xM_Color_1"
+    assert import_materials.find_asset_path("3xM_Normal_1", asset_index) is None
+
+    # a passed registry is used instead of the one of the editor
+    other_registry = AssetRegistry()
+    assert len(import_materials.build_asset_index(class_names=["MaterialInstanceConstant"], asset_registry=other_registry)) == 1
+
+    # an import clears the index
+    import_materials.import_textures_batched([(os.path.join(tmp_dir, "normal_1.png"), "/Game/3xM/Textures/Material_1", "3xM_Normal_1")])
+    REGISTRY.append(("3xM_Normal_1", "/Game/3xM/Textures/Material_1/3xM_Normal_1", "Texture2D"))
+    assert import_materials.find_asset_path("3xM_Normal_1", import_materials.get_asset_index(class_names=["Texture2D"])) is not None
+    assert len(get_calls("AssetRegistry.get_assets")) == 3
+
+
+
+def check_materials_from_manifest(tmp_dir):
+    import import_materials
+
+    reset()
+    ASSETS.update(["/Game/3xM/Textures/Material_1/3xM_Color_1", "/Game/3xM/Textures/Material_1/3xM_Roughness_1"])
+    REGISTRY.extend([("3xM_Color_1", "/Game/3xM/Textures/Material_1/3xM_Color_1", "Texture2D"),
+                     ("3xM_Roughness_1", "/Game/3xM/Textures/Material_1/3xM_Roughness_1", "Texture2D")])
+
+    manifest_path = os.path.join(tmp_dir, "material_manifest.json")
+    import_materials.save_material_manifest({"3xM_Material_ID_1": {"base_color": "3xM_Color_1", "roughness": "3xM_Roughness_1", "ao": None}},
+                                            manifest_path)
+    assert import_materials.create_materials_from_manifest(manifest_path) == 1
+
+    # parent material: color samplers with neutral defaults, only the normal map uses the normal sampler
+    parameters = {cur_sample.get_editor_property("parameter_name"): (cur_sample, output_name)
+                  for (cur_sample, output_name, _), _ in get_calls("MaterialEditingLibrary.connect_material_property")}
+    assert len(parameters) == len(import_materials.MATERIAL_PARAMETERS)
+    for parameter_name, material_property, sampler_type, output_name, default_texture in import_materials.MATERIAL_PARAMETERS.values():
+        cur_sample, cur_output_name = parameters[parameter_name]
+        assert cur_sample.get_editor_property("texture") == StubObject(default_texture)
+        assert cur_output_name == output_name
+        if parameter_name == "Normal":
+            assert cur_sample.get_editor_property("sampler_type") == StubObject("MaterialSamplerType.SAMPLERTYPE_NORMAL")
+        else:
+            assert cur_sample.get_editor_property("sampler_type") == StubObject("MaterialSamplerType.SAMPLERTYPE_COLOR")
+    assert parameters["AmbientOcclusion"][0].get_editor_property("texture") == StubObject("/Engine/EngineResources/WhiteSquareTexture")
+    assert parameters["Metallic"][0].get_editor_property("texture") == StubObject("/Engine/EngineResources/Black")
+
+    # instance: only the maps with a texture get set, missing maps keep the default of the parent
+    texture_parameters = [args[1] for args, _ in get_calls("MaterialEditingLibrary.set_material_instance_texture_parameter_value")]
+    assert texture_parameters == ["BaseColor", "Roughness"]
+    assert get_calls("EditorLoadingAndSavingUtils.save_dirty_packages") == [((False, True), dict())]
+
+    # second run: the existing instance gets reused, a plain material with the same name gets replaced by an instance
+    ASSETS.add("/Game/3xM/Materials/3xM_Material_ID_2")
+    import_materials.save_material_manifest({"3xM_Material_ID_1": {"base_color": "3xM_Color_1"},
+                                             "3xM_Material_ID_2": {"base_color": "3xM_Color_1"}}, manifest_path)
+    CALLS.clear()
+    assert import_materials.create_materials_from_manifest(manifest_path) == 2
+    assert get_calls("EditorAssetLibrary.delete_asset") == [(("/Game/3xM/Materials/3xM_Material_ID_2",), dict())]
+    assert [args[0] for args, _ in get_calls("AssetTools.create_asset") if args[2] is MaterialInstanceConstant] == ["3xM_Material_ID_2"]
+    assert ASSET_CLASSES["/Game/3xM/Materials/3xM_Material_ID_2"] is MaterialInstanceConstant
+
+
+
+def check_import_timing(tmp_dir):
+    import import_materials
+
+    # one import call and one save per texture vs. one import call and one save for all textures
+    reset()
+    textures = [(os.path.join(tmp_dir, f"color_{idx}.png"), "/Game/3xM/Textures", f"3xM_Color_{idx}") for idx in range(20)]
+    start_time = time.time()
+    for file_path, destination_path, name in textures:
+        import_materials.import_texture(file_path, destination_path, name)
+    single_time = time.time() - start_time
+
+    reset()
+    start_time = time.time()
+    import_materials.import_textures_batched(textures)
+    batched_time = time.time() - start_time
+
+    print(f"    -> {len(textures)} textures: single imports {single_time:.2f}s, batched import {batched_time:.2f}s")
+    assert batched_time < single_time
+
+
+
+def check_datatable(tmp_dir):
+    import csv
+    import json
+    import import_materials
+
+    reset()
+    ASSETS.add("/Game/material_data_table")
+    source_path = os.path.join(tmp_dir, "Materials")
+    os.makedirs(source_path)
+    for cur_name in ["3xM_Material_ID_1", "3xM_Material_ID_0", "3xM_Parent_Material"]:
+        open(os.path.join(source_path, f"{cur_name}.uasset"), "w").close()
+
+    # CSV: header + one row per material, the parent material gets skipped
+    rows_path = os.path.join(tmp_dir, "material_data_table.csv")
+    assert import_materials.add_all_materials_to_datatable(source_path, rows_path=rows_path)
+    with open(rows_path, "r") as rows_file:
+        rows_string = rows_file.read()
+    assert list(csv.reader(rows_string.splitlines())) == [["---", "material"],
+                               ["3xM_Material_ID_0", "/Game/3xM/Materials/3xM_Material_ID_0.3xM_Material_ID_0"],
+                               ["3xM_Material_ID_1", "/Game/3xM/Materials/3xM_Material_ID_1.3xM_Material_ID_1"]]
+
+    # one fill call with the complete file, then the data table gets saved
+    fill_calls = get_calls("DataTableFunctionLibrary.fill_data_table_from_csv_string")
+    assert len(fill_calls) == 1
+    assert fill_calls[0][0] == (StubObject("/Game/material_data_table"), rows_string)
+    assert len(get_calls("EditorAssetLibrary.save_loaded_asset")) == 1
+
+    # JSON
+    rows_path = os.path.join(tmp_dir, "material_data_table.json")
+    assert import_materials.add_all_materials_to_datatable(source_path, rows_path=rows_path)
+    with open(rows_path, "r") as rows_file:
+        assert json.load(rows_file)[0] == {"Name": "3xM_Material_ID_0", "material": "/Game/3xM/Materials/3xM_Material_ID_0.3xM_Material_ID_0"}
+    assert len(get_calls("DataTableFunctionLibrary.fill_data_table_from_json_string")) == 1
+
+    # missing data table -> nothing gets filled
+    assert not import_materials.add_all_materials_to_datatable(source_path, data_table_path="/Game/missing_table", rows_path=rows_path)
+    assert len(get_calls("DataTableFunctionLibrary.fill_data_table_from_json_string")) == 1
+
+
+
+def check_import_fbx_meshes(tmp_dir):
+    import json
+    import import_fbx_meshes
+
+    reset()
+    fbx_dir = os.path.join(tmp_dir, "models")
+    os.makedirs(os.path.join(fbx_dir, "textures"))
+    for idx in range(3):
+        with open(os.path.join(fbx_dir, f"model_{idx}.fbx"), "w") as fbx_file:
+            fbx_file.write(f"mesh {idx}")
+
+    # first run imports all meshes in chunks with one save per chunk and one shared options object
+    report = import_fbx_meshes.import_fbx_meshes_batched(fbx_dir, "/Game/3xM/3D_models", chunk_size=2)
+    assert [cur_report["status"] for cur_report in report] == ["imported"]*3
+    import_calls = get_calls("AssetTools.import_asset_tasks")
+    assert [len(args[0]) for args, _ in import_calls] == [2, 1]
+    assert [args for args, _ in get_calls("EditorLoadingAndSavingUtils.save_dirty_packages")] == [(False, True)]*2
+    assert len(set([id(cur_task.options) for args, _ in import_calls for cur_task in args[0]])) == 1
+    with open(os.path.join(fbx_dir, "import_manifest.json"), "r") as manifest_file:
+        assert json.load(manifest_file)["model_0.fbx"]["asset_paths"] == ["/Game/3xM/3D_models/model_0.model_0"]
+
+    # second run skips the unchanged meshes, a changed mesh gets imported again
+    with open(os.path.join(fbx_dir, "model_1.fbx"), "w") as fbx_file:
+        fbx_file.write("changed mesh 1")
+    report = import_fbx_meshes.import_fbx_meshes_batched(fbx_dir, "/Game/3xM/3D_models", chunk_size=2)
+    assert {cur_report["file"]: cur_report["status"] for cur_report in report} == \
+        {"model_0.fbx": "skipped", "model_1.fbx": "imported", "model_2.fbx": "skipped"}
+
+    # removed asset -> imported again
+    ASSETS.discard("/Game/3xM/3D_models/model_2")
+    report = import_fbx_meshes.import_fbx_meshes_batched(fbx_dir, "/Game/3xM/3D_models", chunk_size=2)
+    assert [cur_report["file"] for cur_report in report if cur_report["status"] == "imported"] == ["model_2.fbx"]
+
+
+
+def run_checks():
+    import tempfile
+
+    install()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for cur_check in [check_import_textures_batched, check_asset_index, check_materials_from_manifest,
+                          check_import_timing, check_datatable, check_import_fbx_meshes]:
+            cur_check(tmp_dir)
+            print(f"    -> {cur_check.__name__}: ok")
+
+
+
+if __name__ == "__main__":
+    run_checks()